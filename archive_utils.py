@@ -0,0 +1,108 @@
+import time
+from datetime import datetime, timedelta
+
+from bot_config import ROW_RETENTION_DAYS, ARCHIVE_INTERVAL_HOURS
+from registry_utils import SHEET_COLUMNS, TIMESTAMP_FORMAT, utc_epoch
+from sheet_utils import refresh, contiguous_runs, own_writes
+
+ARCHIVE_WORKSHEET = "Archive"
+
+
+def archivable_rows(registry, now=None):
+    """
+    Return the row numbers that can leave the ban sheet: all rows of users
+    whose every row is older than ROW_RETENTION_DAYS. A user with any
+    recent row keeps all of their rows, so their forgiveness and exemptions
+    stay in force. Once all of a user's rows are old, enforcement no longer
+    looks at them and has_user() keeps the user from being logged again,
+    so overrides and exemptions are archived with the rest.
+    """
+    # Enforcement looks back one day; never archive anything it could need.
+    days = max(ROW_RETENTION_DAYS, 2)
+    cutoff = utc_epoch((now or datetime.utcnow()) - timedelta(days=days))
+    row_nums = []
+    # Only users with at least one old row can qualify.
+    for user in {r.username for _, r in registry.rows_between(end=cutoff) if r.username}:
+        nums = registry.by_user[user]
+        records = [registry.row(n) for n in nums]
+        if all(r.timestamp is not None and r.timestamp < cutoff for r in records):
+            row_nums.extend(nums)
+    return sorted(row_nums)
+
+
+def archive_due(store):
+    last = store.get_meta("last_archive")
+    return last is None or time.time() - last >= ARCHIVE_INTERVAL_HOURS * 3600
+
+
+def archive_old_rows(ctx, force=False):
+    """
+    Move old rows out of the ban sheet, at most every ARCHIVE_INTERVAL_HOURS.
+
+    The rows are appended to the 'Archive' worksheet in one call, deleted
+    from the ban sheet in one batch request and moved to the store's archive
+    table, which keeps them (and their usernames) for status replies, the
+    duplicate check and stats. Runs with the sheet sync worker paused and
+    only when every local change has been pushed, since the remaining rows
+    are renumbered.
+    """
+    store, registry, writer = ctx.store, ctx.registry, ctx.writer
+    if not force and not archive_due(store):
+        return 0
+
+    with ctx.sheet_sync.busy:
+        writer.flush()
+        sheet = ctx.sheet
+        # Make sure row numbers still match the sheet before deleting by them.
+        refresh(sheet, registry, store, writer.lock)
+        with writer.push_lock, writer.lock:
+            if store.dirty_rows():
+                print("[WARN] Unpushed sheet changes, archiving postponed.")
+                return 0
+            row_nums = archivable_rows(registry)
+            if not row_nums:
+                store.set_meta("last_archive", time.time())
+                print("[INFO] No sheet rows old enough to archive.")
+                return 0
+
+            header = registry.header or SHEET_COLUMNS
+            rows = [registry.row(n).as_dict() for n in row_nums]
+            with own_writes(sheet, store):
+                archive = _archive_sheet(sheet, header)
+                archive.append_rows(
+                    [[row.get(h, '') for h in header] for row in rows],
+                    value_input_option='USER_ENTERED',
+                )
+                # Bottom ranges first, so the row numbers above stay valid.
+                ranges = [(start, start + len(run)) for start, run in
+                          contiguous_runs({n: True for n in row_nums})]
+                sheet.spreadsheet.batch_update({"requests": [
+                    {"deleteDimension": {"range": {
+                        "sheetId": sheet.id,
+                        "dimension": "ROWS",
+                        "startIndex": start - 1,
+                        "endIndex": end - 1,
+                    }}}
+                    for start, end in reversed(ranges)
+                ]})
+
+            store.archive(row_nums, datetime.utcnow().strftime(TIMESTAMP_FORMAT))
+            registry.load(store.load_rows())
+            registry.archived |= {str(row.get('Username', '')).strip().lower() for row in rows}
+            store.set_meta("last_archive", time.time())
+
+    print(f"[INFO] Archived {len(row_nums)} sheet rows ({len(ranges)} ranges); "
+          f"{len(registry)} rows remain in the ban sheet.")
+    return len(row_nums)
+
+
+def _archive_sheet(sheet, header):
+    import gspread
+
+    try:
+        return sheet.spreadsheet.worksheet(ARCHIVE_WORKSHEET)
+    except gspread.exceptions.WorksheetNotFound:
+        archive = sheet.spreadsheet.add_worksheet(title=ARCHIVE_WORKSHEET, rows="1", cols=str(len(header)))
+        archive.append_rows([list(header)], value_input_option='USER_ENTERED')
+        print(f"[INFO] Created '{ARCHIVE_WORKSHEET}' worksheet.")
+        return archive
@@ -0,0 +1,343 @@
+"""
+In-process stand-ins for the praw and gspread objects the bot uses.
+
+They keep everything in memory, count every call by endpoint (one call per
+100-item page for listings, like the real APIs) and can sleep a fixed
+latency per call to mimic network round trips. Used by the benchmark
+runner and the replay harness; never by the bot itself.
+"""
+import re
+import time
+import threading
+from collections import Counter
+
+
+class CallCounter:
+    """
+    Shared call count (by endpoint) and simulated latency for all fakes
+    of one backend.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def hit(self, endpoint, n=1):
+        with self.lock:
+            self.calls[endpoint] += n
+        if self.latency:
+            time.sleep(self.latency * n)
+
+    def snapshot(self):
+        with self.lock:
+            return Counter(self.calls)
+
+
+def _paged(counter, endpoint, items, limit=None):
+    """
+    Yield items like a praw ListingGenerator, counting one call per page.
+    """
+    for i, item in enumerate(items):
+        if limit is not None and i >= limit:
+            return
+        if i % 100 == 0:
+            counter.hit(endpoint)
+        yield item
+    if not items:
+        counter.hit(endpoint)
+
+
+# --- Reddit ---
+
+class FakeRedditor:
+    def __init__(self, reddit, name):
+        self._reddit = reddit
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def message(self, subject, message):
+        self._reddit.counter.hit("POST api/compose")
+        self._reddit.sent_messages.append((self.name, subject, message))
+
+
+class FakeBan:
+    def __init__(self, name, note=""):
+        self.name = name
+        self.note = note
+
+
+class FakeLogEntry:
+    def __init__(self, id, action, mod, target_author, description, created_utc, subreddit):
+        self.id = id
+        self.action = action
+        self.mod = FakeRedditor(None, mod)
+        self.target_author = target_author
+        self.description = description
+        self.created_utc = created_utc
+        self.subreddit = subreddit
+
+
+class FakeConversation:
+    def __init__(self, sub, id, last_updated, messages):
+        self._sub = sub
+        self.id = id
+        self.last_updated = last_updated
+        self.messages = messages
+        self.owner = sub
+
+    def reply(self, body=None, **kwargs):
+        self._sub._reddit.counter.hit("POST api/mod/conversations/{id}")
+        self._sub._reddit.modmail_replies.append((self.id, body))
+
+
+class FakeBanned:
+    def __init__(self, sub):
+        self._sub = sub
+        self.bans = {}   # lowercased name -> FakeBan
+
+    def __call__(self, redditor=None, limit=None, **kwargs):
+        counter = self._sub._reddit.counter
+        if redditor is not None:
+            counter.hit("GET r/{sub}/about/banned")
+            ban = self.bans.get(str(redditor).lower())
+            return iter([ban] if ban else [])
+        return _paged(counter, "GET r/{sub}/about/banned", list(self.bans.values()), limit)
+
+    def add(self, redditor, ban_reason=None, note=None, **kwargs):
+        self._sub._reddit.counter.hit("POST r/{sub}/api/friend")
+        name = str(redditor)
+        self.bans[name.lower()] = FakeBan(name, note or ban_reason or "")
+        self._sub._reddit.actions.append(("ban", name.lower(), self._sub.display_name))
+
+    def remove(self, redditor):
+        self._sub._reddit.counter.hit("POST r/{sub}/api/unfriend")
+        self.bans.pop(str(redditor).lower(), None)
+        self._sub._reddit.actions.append(("unban", str(redditor).lower(), self._sub.display_name))
+
+
+class FakeModLog:
+    def __init__(self, sub):
+        self._sub = sub
+        self.entries = []   # newest first, like the API
+
+    def log(self, action=None, limit=100, **kwargs):
+        entries = [e for e in self.entries if action is None or e.action == action]
+        return _paged(self._sub._reddit.counter, "GET r/{sub}/about/log", entries, limit)
+
+
+class FakeModmail:
+    def __init__(self, sub):
+        self._sub = sub
+        self.conversations_list = []   # most recently updated first
+
+    def conversations(self, state=None, sort=None, limit=100, **kwargs):
+        return _paged(self._sub._reddit.counter, "GET api/mod/conversations",
+                      self.conversations_list, limit)
+
+
+class FakeSubreddit:
+    def __init__(self, reddit, name, mods=()):
+        self._reddit = reddit
+        self.display_name = name
+        self.banned = FakeBanned(self)
+        self.mod = FakeModLog(self)
+        self.modmail = FakeModmail(self)
+        self.mods = [FakeRedditor(reddit, m) for m in mods]
+
+    def __str__(self):
+        return self.display_name
+
+    def moderator(self):
+        self._reddit.counter.hit("GET r/{sub}/about/moderators")
+        return list(self.mods)
+
+
+class FakeInbox:
+    def __init__(self, reddit):
+        self._reddit = reddit
+        self.items = []
+
+    def unread(self, limit=None):
+        return _paged(self._reddit.counter, "GET message/unread", list(self.items), limit)
+
+
+class FakeReddit:
+    """
+    Stands in for praw.Reddit. Subreddits are created on first use;
+    every ban, unban, DM and modmail reply is recorded for inspection.
+    """
+
+    def __init__(self, latency=0.0):
+        self.counter = CallCounter(latency)
+        self.subs = {}
+        self.inbox = FakeInbox(self)
+        self.actions = []
+        self.sent_messages = []
+        self.modmail_replies = []
+
+    def subreddit(self, name):
+        key = name.lower()
+        if key not in self.subs:
+            self.subs[key] = FakeSubreddit(self, name)
+        return self.subs[key]
+
+    def redditor(self, name):
+        return FakeRedditor(self, name)
+
+
+# --- Google Sheets ---
+
+class WorksheetNotFound(Exception):
+    pass
+
+
+def _worksheet_not_found():
+    try:
+        from gspread.exceptions import WorksheetNotFound as error
+    except ImportError:
+        error = WorksheetNotFound
+    return error
+
+
+def _a1_to_rowcol(cell):
+    match = re.match(r"([A-Z]+)(\d*)", cell.upper())
+    col = 0
+    for ch in match.group(1):
+        col = col * 26 + ord(ch) - 64
+    return (int(match.group(2)) if match.group(2) else None), col
+
+
+class FakeWorksheet:
+    """
+    Stands in for gspread.Worksheet: a list of rows, header first.
+    """
+
+    def __init__(self, spreadsheet, title, rows=None, row_count=1000):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = len(spreadsheet.worksheets)
+        self.data = [list(r) for r in (rows or [])]
+        self._row_count = row_count
+
+    @property
+    def _counter(self):
+        return self.spreadsheet.counter
+
+    def _edited(self):
+        self.spreadsheet.revision += 1
+
+    @property
+    def row_count(self):
+        return max(self._row_count, len(self.data))
+
+    def add_rows(self, n):
+        self._counter.hit("POST :batchUpdate")
+        self._row_count = self.row_count + n
+
+    def get_all_records(self):
+        self._counter.hit("GET /values/{range}")
+        if not self.data:
+            return []
+        header = self.data[0]
+        return [dict(zip(header, list(r) + [""] * (len(header) - len(r)))) for r in self.data[1:]]
+
+    def row_values(self, row):
+        self._counter.hit("GET /values/{range}")
+        return list(self.data[row - 1]) if row <= len(self.data) else []
+
+    def get(self, a1_range):
+        self._counter.hit("GET /values/{range}")
+        start, _ = _a1_to_rowcol(a1_range.split(":")[0])
+        return [list(r) for r in self.data[(start or 1) - 1:]]
+
+    def append_rows(self, values, **kwargs):
+        self._counter.hit("POST /values/{range}:append")
+        self._edited()
+        first = len(self.data) + 1
+        self.data.extend([list(v) for v in values])
+        last = len(self.data)
+        return {"updates": {"updatedRange": f"{self.title}!A{first}:J{last}"}}
+
+    def _write(self, a1_range, values):
+        self._edited()
+        start = a1_range.split("!")[-1].split(":")[0]
+        row, col = _a1_to_rowcol(start)
+        for r, row_values in enumerate(values):
+            while len(self.data) < row + r:
+                self.data.append([])
+            target = self.data[row + r - 1]
+            for c, value in enumerate(row_values):
+                while len(target) < col + c:
+                    target.append("")
+                target[col + c - 1] = value
+
+    def batch_update(self, data, **kwargs):
+        self._counter.hit("POST /values:batchUpdate")
+        for item in data:
+            self._write(item["range"], item["values"])
+
+    def update(self, a1_range, values, **kwargs):
+        self._counter.hit("PUT /values/{range}")
+        self._write(a1_range, values)
+
+    def clear(self):
+        self._counter.hit("POST /values/{range}:clear")
+        self._edited()
+        self.data = []
+
+
+class FakeDriveResponse:
+    def __init__(self, body):
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class FakeSpreadsheet:
+    """
+    Stands in for gspread.Spreadsheet. It is also its own `client`, answering
+    the Drive metadata request for modifiedTime (a counter bumped by every
+    write to any worksheet).
+    """
+
+    def __init__(self, latency=0.0):
+        self.counter = CallCounter(latency)
+        self.worksheets = {}
+        self.id = "fake-spreadsheet"
+        self.revision = 0
+
+    @property
+    def client(self):
+        return self
+
+    def request(self, method, endpoint, params=None, **kwargs):
+        self.counter.hit("GET drive/files/{id}")
+        return FakeDriveResponse({"modifiedTime": str(self.revision)})
+
+    @property
+    def sheet1(self):
+        return next(iter(self.worksheets.values()))
+
+    def add_worksheet(self, title, rows=1000, cols=26):
+        self.counter.hit("POST :batchUpdate")
+        self.worksheets[title] = FakeWorksheet(self, title, row_count=int(rows))
+        return self.worksheets[title]
+
+    def batch_update(self, body):
+        self.counter.hit("POST :batchUpdate")
+        self.revision += 1
+        by_id = {ws.id: ws for ws in self.worksheets.values()}
+        for request in body.get("requests", []):
+            dim = request.get("deleteDimension", {}).get("range")
+            if dim and dim.get("dimension") == "ROWS":
+                del by_id[dim["sheetId"]].data[dim["startIndex"]:dim["endIndex"]]
+
+    def worksheet(self, title):
+        self.counter.hit("GET /")
+        if title not in self.worksheets:
+            raise _worksheet_not_found()(title)
+        return self.worksheets[title]
@@ -0,0 +1,312 @@
+"""
+Replay a recorded bot run offline and check it still makes the same calls.
+
+    python3 cross_sub_ban_bot.py --record fixtures/run1     # live, records
+    python -m benchmarks.replay fixtures/run1                # offline replay
+
+The replay starts from the recorded .bot_state, answers every Reddit and
+Sheets request from the recording and runs the whole bot (main()) again.
+time.time(), time.sleep() and datetime.utcnow() run on a virtual clock
+that starts at the recorded start time and moves forward by each served
+request's recorded latency, so nothing waits and time-based decisions
+come out the same.
+
+Reported: real wall time of the replay (our own code), recorded API time
+of the requests served, call counts, requests the recording had no answer
+for, and any difference in the actions (POST/PUT/PATCH/DELETE requests:
+bans, unbans, DMs, modmail replies, sheet writes) against the recording.
+Actions are compared one by one (each ban per user and sub, each sheet
+row appended, each range written), so a different batching or order of
+the same writes is not a change. Exits with status 1 if the actions changed.
+
+The background sheet sync thread is not started during a replay; pending
+writes are pushed directly instead, so the recorded background reads
+show up as unused.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import datetime as _datetime
+from collections import Counter, defaultdict, deque
+
+os.environ.setdefault("BOT_WORK_DIR", tempfile.mkdtemp(prefix="xsub_replay_"))
+
+import bot_config  # noqa: E402
+from replay_utils import request_fields, request_key, action_keys, MUTATING_METHODS  # noqa: E402
+from metrics_utils import wrap_reddit_requests  # noqa: E402
+
+BOT_MODULES = (
+    "archive_utils", "core_utils", "cross_sub_ban_bot", "dm_utils", "log_utils", "modmail_utils",
+    "plan_utils", "rate_utils", "retry_utils", "run_context", "sheet_utils", "snapshot_utils",
+    "stats_utils", "super", "metrics_utils", "store_utils", "state_utils",
+)
+
+
+class VirtualClock:
+    def __init__(self, start):
+        self.start = start
+        self.now = start
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += max(seconds, 0)
+        self.now += max(seconds, 0)
+
+    def advance(self, seconds):
+        self.now += max(seconds or 0, 0)
+
+
+def virtual_datetime(clock):
+    class VirtualDatetime(_datetime.datetime):
+        @classmethod
+        def utcnow(cls):
+            return _datetime.datetime.utcfromtimestamp(clock.time())
+
+        @classmethod
+        def now(cls, tz=None):
+            return _datetime.datetime.fromtimestamp(clock.time(), tz)
+
+    return VirtualDatetime
+
+
+class ReplayResponse:
+    """
+    Enough of requests.Response for gspread and the prawcore exceptions.
+    """
+
+    def __init__(self, status=200, body=None, text=None, headers=None):
+        self.status_code = status or 200
+        self.ok = self.status_code < 400
+        self._body = body
+        self.text = text if text is not None else json.dumps(body)
+        self.content = self.text.encode()
+        self.headers = headers or {}
+
+    def json(self):
+        if self._body is None:
+            return json.loads(self.text)
+        return self._body
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class Player:
+    """
+    Serves recorded responses. A request is matched on method, path,
+    params and body; failing that, on method and path alone (in recorded
+    order), which is reported as a changed request.
+    """
+
+    def __init__(self, entries, clock):
+        self.clock = clock
+        self.exact = defaultdict(deque)
+        self.by_path = defaultdict(deque)
+        self.recorded_actions = Counter()
+        for entry in entries:
+            entry["key"] = request_key(entry["service"], entry["method"], entry["path"], entry["fields"])
+            entry["used"] = False
+            self.exact[entry["key"]].append(entry)
+            self.by_path[(entry["service"], entry["method"], entry["path"])].append(entry)
+            if entry["method"] in MUTATING_METHODS:
+                self.recorded_actions.update(
+                    action_keys(entry["service"], entry["method"], entry["path"], entry["fields"]))
+        self.entries = entries
+        self.replayed_actions = Counter()
+        self.calls = Counter()
+        self.changed = []
+        self.unanswered = []
+        self.api_seconds = 0.0
+
+    def _take(self, queue):
+        while queue:
+            entry = queue.popleft()
+            if not entry["used"]:
+                entry["used"] = True
+                return entry
+        return None
+
+    def attach_reddit(self, reddit):
+        wrap_reddit_requests(reddit, lambda request: self._serve("reddit"))
+
+    def attach_sheets(self, client):
+        target = getattr(client, "http_client", client)
+        target.request = self._serve("sheets")
+
+    def _serve(self, service):
+        def serve(method, path, *args, **kwargs):
+            method = str(method).upper()
+            fields = request_fields(service, args, kwargs)
+            key = request_key(service, method, str(path), fields)
+            self.calls[service] += 1
+            if method in MUTATING_METHODS:
+                self.replayed_actions.update(action_keys(service, method, str(path), fields))
+
+            entry = self._take(self.exact[key])
+            if entry is None:
+                entry = self._take(self.by_path[(service, method, str(path))])
+                if entry is not None:
+                    self.changed.append(key)
+            if entry is None:
+                self.unanswered.append(key)
+                if method not in MUTATING_METHODS:
+                    raise LookupError(f"No recorded response for {method} {path}")
+                return {"json": {"errors": []}} if service == "reddit" else ReplayResponse(200, {})
+
+            self.clock.advance(entry.get("elapsed"))
+            self.api_seconds += entry.get("elapsed") or 0
+            if "error" in entry:
+                raise _rebuild_error(service, entry["error"])
+            response = entry["response"]
+            if service == "reddit":
+                return response["json"]
+            return ReplayResponse(response.get("status"), response.get("json"), response.get("text"))
+        return serve
+
+
+def _rebuild_error(service, error):
+    response = ReplayResponse(error.get("status") or 500, None, error.get("text") or "",
+                              error.get("headers"))
+    try:
+        if service == "reddit":
+            import prawcore
+            return getattr(prawcore.exceptions, error["type"])(response)
+        import gspread
+        return getattr(gspread.exceptions, error["type"])(response)
+    except Exception:
+        return RuntimeError(f"{error['type']}: {error.get('text')}")
+
+
+def load_fixture(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    with open(os.path.join(path, "requests.jsonl")) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda e: e.get("at", 0))
+    return meta, entries
+
+
+def replay(path, verbose=False):
+    meta, entries = load_fixture(path)
+    if meta.get("config") != bot_config.config:
+        print("[REPLAY] Warning: config.json differs from the recorded run's.")
+
+    # Start from the state the recorded run started from.
+    shutil.rmtree(bot_config.STATE_DIR, ignore_errors=True)
+    if os.path.isdir(os.path.join(path, "state")):
+        shutil.copytree(os.path.join(path, "state"), bot_config.STATE_DIR)
+    bot_config.TRUSTED_SUBS[:] = meta["trusted_subs"]
+    bot_config.TRUSTED_SOURCES.clear()
+    bot_config.TRUSTED_SOURCES.update(f"r/{s}" for s in meta["trusted_subs"])
+
+    import praw
+    import gspread
+    import requests
+    import cross_sub_ban_bot as bot
+    from run_context import RunContext
+
+    clock = VirtualClock(meta["started_at"])
+    player = Player(entries, clock)
+
+    class ReplayContext(RunContext):
+        def start_sheet_sync(self):
+            pass
+
+    real_time, real_sleep = time.time, time.sleep
+    vdatetime = virtual_datetime(clock)
+    patched = []
+    time.time, time.sleep = clock.time, clock.sleep
+    for name in BOT_MODULES:
+        module = sys.modules.get(name)
+        if module is not None and getattr(module, "datetime", None) is _datetime.datetime:
+            patched.append(module)
+            module.datetime = vdatetime
+
+    start = time.perf_counter()
+    try:
+        reddit = praw.Reddit(client_id="replay", client_secret="replay", username="replay",
+                             password="replay", user_agent="replay", check_for_updates=False)
+        player.attach_reddit(reddit)
+        client = gspread.Client(None, session=requests.Session())
+        player.attach_sheets(client)
+
+        ctx = ReplayContext()
+        ctx._reddit = reddit
+        ctx._sheets = (client.open_by_key(meta["sheet_key"]).sheet1, client, meta["sheet_key"])
+        out = sys.stdout if verbose else open(os.devnull, "w")
+        saved, sys.stdout = sys.stdout, out
+        try:
+            bot.main(list(meta.get("argv", [])), ctx)
+        finally:
+            sys.stdout = saved
+    finally:
+        wall = time.perf_counter() - start
+        time.time, time.sleep = real_time, real_sleep
+        for module in patched:
+            module.datetime = _datetime.datetime
+
+    return report(player, wall, clock)
+
+
+def settled(actions):
+    """
+    Sheet range writes only matter for the value they leave behind, so
+    count each distinct one once; everything else is compared as a multiset.
+    """
+    return Counter({key: 1 if key.startswith('["sheet_write"') else n for key, n in actions.items()})
+
+
+def report(player, wall, clock):
+    recorded, replayed = settled(player.recorded_actions), settled(player.replayed_actions)
+    added = replayed - recorded
+    missing = recorded - replayed
+    unused = [e for e in player.entries if not e["used"]]
+    print(f"[REPLAY] Wall time {wall:.2f}s, recorded API time {player.api_seconds:.2f}s, "
+          f"virtual sleeps {clock.slept:.1f}s.")
+    print(f"[REPLAY] Calls served: {dict(player.calls)}; recorded requests unused: {len(unused)}.")
+    if player.changed:
+        print(f"[REPLAY] {len(player.changed)} requests differed from the recording in params or body.")
+    for key in player.unanswered[:20]:
+        print(f"[REPLAY] No recorded answer: {key}")
+    for key, n in list(added.items())[:20]:
+        print(f"[REPLAY] NEW action x{n}: {key}")
+    for key, n in list(missing.items())[:20]:
+        print(f"[REPLAY] MISSING action x{n}: {key}")
+    same = not added and not missing
+    print("[REPLAY] Actions match the recording." if same else "[REPLAY] Actions CHANGED.")
+    return {
+        "wall_seconds": round(wall, 3),
+        "recorded_api_seconds": round(player.api_seconds, 3),
+        "calls": dict(player.calls),
+        "unused": len(unused),
+        "unanswered": len(player.unanswered),
+        "new_actions": sum(added.values()),
+        "missing_actions": sum(missing.values()),
+        "same_actions": same,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixture", help="directory written by cross_sub_ban_bot.py --record")
+    parser.add_argument("--output", help="write the replay report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own output")
+    args = parser.parse_args(argv)
+
+    result = replay(args.fixture, args.verbose)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0 if result["same_actions"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Synthetic-scale benchmark of the bot's main phases against fake backends.
+
+    python -m benchmarks.run --rows 100000 --subs 50 --events 500
+    python -m benchmarks.run --output bench.json --compare old_bench.json
+
+Builds a deterministic workload (same --seed, same data), runs the sheet
+load, the per-user registry lookups, the modlog sync, enforcement and the
+stats write, and reports wall time, peak traced memory and API calls for
+each. Bot output is silenced unless --verbose is given. All state and log
+files go to a temporary directory.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+from datetime import datetime, timedelta
+
+# Must be set before any bot module reads bot_config.
+os.environ.setdefault("BOT_WORK_DIR", tempfile.mkdtemp(prefix="xsub_bench_"))
+
+import bot_config  # noqa: E402
+from registry_utils import SHEET_COLUMNS  # noqa: E402
+from benchmarks.fakes import FakeReddit, FakeSpreadsheet, FakeLogEntry, FakeBan  # noqa: E402
+
+
+def build_workload(rows, subs, events, bans_per_sub, seed, latency):
+    """
+    Return (reddit, spreadsheet, sub_names) filled with synthetic data.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    sub_names = [f"team{i:02d}" for i in range(subs)]
+    reddit = FakeReddit(latency)
+    spreadsheet = FakeSpreadsheet(latency)
+    for name in sub_names:
+        reddit.subreddit(name).mods = [reddit.redditor(f"mod_{name}")]
+
+    sheet_rows = [list(SHEET_COLUMNS)]
+    for i in range(rows):
+        src = rng.choice(sub_names)
+        ts = now - timedelta(days=rng.uniform(1.1, 365))
+        forgiven = rng.random() < 0.05
+        sheet_rows.append([
+            f"user{i}", f"r/{src}", bot_config.CROSS_SUB_BAN_REASON, ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'yes' if forgiven else '', f"log{i}", f"mod_{src}", src if forgiven else '',
+            ts.strftime('%Y-%m-%d %H:%M:%S') if forgiven else '',
+            rng.choice(sub_names) if rng.random() < 0.03 else '',
+        ])
+    sheet = spreadsheet.add_worksheet("Bans")
+    sheet.data = sheet_rows
+
+    # Existing ban lists: a slice of old pact bans in every sub.
+    for name in sub_names:
+        banned = reddit.subreddit(name).banned.bans
+        for i in rng.sample(range(rows), min(bans_per_sub, rows)):
+            banned[f"user{i}"] = FakeBan(f"user{i}", f"{bot_config.CROSS_SUB_BAN_REASON}: old")
+
+    # New modlog activity: pact bans of new users (90%) and unbans (10%).
+    for j in range(events):
+        src = rng.choice(sub_names)
+        created = (now - timedelta(minutes=rng.uniform(0, 30))).timestamp()
+        if rng.random() < 0.9:
+            entry = FakeLogEntry(f"ev{j}", "banuser", f"mod_{src}", f"newuser{j}",
+                                 bot_config.CROSS_SUB_BAN_REASON, created, src)
+            reddit.subreddit(src).banned.bans[f"newuser{j}"] = FakeBan(f"newuser{j}", bot_config.CROSS_SUB_BAN_REASON)
+        else:
+            user = f"user{rng.randrange(rows)}" if rows else f"newuser{j}"
+            entry = FakeLogEntry(f"ev{j}", "unbanuser", f"mod_{src}", user, "", created, src)
+        reddit.subreddit(src).mod.entries.append(entry)
+    for name in sub_names:
+        reddit.subreddit(name).mod.entries.sort(key=lambda e: -e.created_utc)
+    return reddit, spreadsheet, sub_names
+
+
+@contextlib.contextmanager
+def measured(results, name, backends, trace_memory, verbose):
+    before = [b.counter.snapshot() for b in backends]
+    if trace_memory:
+        tracemalloc.reset_peak()
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    start = time.perf_counter()
+    with quiet:
+        yield
+    seconds = time.perf_counter() - start
+    calls = {}
+    for backend, old in zip(backends, before):
+        diff = backend.counter.snapshot() - old
+        calls.update({k: v for k, v in diff.items()})
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "peak_mb": round(tracemalloc.get_traced_memory()[1] / 2**20, 2) if trace_memory else None,
+        "api_calls": sum(calls.values()),
+        "calls": dict(sorted(calls.items())),
+    }
+    print(f"[BENCH] {name:14} {seconds:9.3f}s  {results[name]['api_calls']:6d} calls"
+          + (f"  peak {results[name]['peak_mb']:.1f} MB" if trace_memory else ""), file=sys.__stdout__)
+
+
+def run(args):
+    reddit, spreadsheet, sub_names = build_workload(
+        args.rows, args.subs, args.events, args.bans_per_sub, args.seed, args.latency
+    )
+    bot_config.TRUSTED_SUBS[:] = sub_names
+    bot_config.TRUSTED_SOURCES.clear()
+    bot_config.TRUSTED_SOURCES.update(f"r/{s}" for s in sub_names)
+
+    import core_utils
+    import sheet_utils
+    import cross_sub_ban_bot as bot
+    from run_context import RunContext
+    from stats_utils import write_stats_sheet
+
+    core_utils.invalidate_mod_cache()
+    ctx = RunContext()
+    ctx._reddit = reddit
+    ctx._sheets = (spreadsheet.sheet1, None, "benchmark")
+    backends = [reddit, spreadsheet]
+    results = {}
+
+    if args.memory:
+        tracemalloc.start()
+    with measured(results, "sheet_load", backends, args.memory, args.verbose):
+        sheet_utils.full_load(ctx.sheet, ctx.registry, ctx.store)
+    with measured(results, "lookups", backends, args.memory, args.verbose):
+        users = [r.get('Username', '') for r in ctx.registry]
+        for user in users:
+            core_utils.is_forgiven(user, ctx.registry)
+            core_utils.exempt_subs_for_user(user, ctx.registry)
+    with measured(results, "sync", backends, args.memory, args.verbose):
+        bot.run_per_sub(ctx, bot.sync_bans_from_sub, sub_names)
+        ctx.writer.flush()
+    with measured(results, "enforce", backends, args.memory, args.verbose):
+        bot.enforce_all(ctx)
+        ctx.writer.flush()
+    with measured(results, "stats", backends, args.memory, args.verbose):
+        write_stats_sheet(ctx)
+    if args.memory:
+        tracemalloc.stop()
+    ctx.close()
+
+    return {
+        "commit": _commit(),
+        "created_at": datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+        "params": {k: getattr(args, k) for k in ("rows", "subs", "events", "bans_per_sub", "seed", "latency")},
+        "phases": results,
+        "actions": len(reddit.actions),
+        "dms": len(reddit.sent_messages),
+    }
+
+
+def compare(current, baseline):
+    print(f"[BENCH] Compared with {baseline.get('commit', '?')[:10]}:")
+    if baseline.get("params") != current["params"]:
+        print("[BENCH] Warning: workloads differ, numbers are not comparable.")
+    for name, now in current["phases"].items():
+        old = baseline.get("phases", {}).get(name)
+        if not old:
+            continue
+        ratio = now["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        print(f"[BENCH] {name:14} {old['seconds']:9.3f}s -> {now['seconds']:9.3f}s ({ratio:5.2f}x)  "
+              f"calls {old['api_calls']} -> {now['api_calls']}")
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="sheet rows (default 100000)")
+    parser.add_argument("--subs", type=int, default=50, help="trusted subs (default 50)")
+    parser.add_argument("--events", type=int, default=500, help="new modlog ban/unban events (default 500)")
+    parser.add_argument("--bans-per-sub", type=int, default=2000, help="existing bans per sub (default 2000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per API call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip tracemalloc (faster)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own output")
+    args = parser.parse_args(argv)
+
+    print(f"[BENCH] Work dir: {os.environ['BOT_WORK_DIR']}")
+    results = run(args)
+    print(f"[BENCH] {results['actions']} bans/unbans, {results['dms']} DMs.")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[BENCH] Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,60 @@
 import os
 import json
 import base64
-import gspread
-import praw
-from oauth2client.service_account import ServiceAccountCredentials
 
 # --- Directory and log paths ---
-WORK_DIR = "/home/runner/work/cross_sub_ban_bot/cross_sub_ban_bot"
-PUBLIC_LOG_JSON = f"{WORK_DIR}/public_ban_log.json"
-PUBLIC_LOG_MD = f"{WORK_DIR}/public_ban_log.md"
+# BOT_WORK_DIR lets benchmarks and replays keep their output out of the real tree.
+WORK_DIR = os.environ.get("BOT_WORK_DIR", "/home/runner/work/cross_sub_ban_bot/cross_sub_ban_bot")
+PUBLIC_LOG_JSON = f"{WORK_DIR}/public_ban_log.json"    # old format, migrated on first use
+PUBLIC_LOG_JSONL = f"{WORK_DIR}/public_ban_log.jsonl"
+PUBLIC_LOG_MD = f"{WORK_DIR}/public_ban_log.md"                # index of recent entries
+PUBLIC_LOG_ARCHIVE_DIR = f"{WORK_DIR}/public_ban_log"          # monthly archive pages
+PUBLIC_LOG_RENDER_STATE = f"{PUBLIC_LOG_ARCHIVE_DIR}/render_state.json"
+STATE_DIR = f"{WORK_DIR}/.bot_state"  # persisted between runs by actions/cache
+RUN_REPORT_PATH = f"{WORK_DIR}/run_report.json"  # timings and API call counts, uploaded as an artifact
 
 # --- Load config.json ---
-with open("config.json") as f:
-    config = json.load(f)
+# Only local files are read at import time; API clients are built lazily
+# by run_context.RunContext.
+def load_config(path="config.json"):
+    if not os.path.exists(path):
+        print(f"[WARN] {path} not found, using defaults.")
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+config = load_config()
 
 
 CROSS_SUB_BAN_REASON   = config.get("CROSS_SUB_BAN_REASON", "Auto XSub Pact Ban")
 EXEMPT_USERS           = set(u.lower() for u in config.get("EXEMPT_USERS", []))
-DAILY_BAN_LIMIT        = config.get("DAILY_BAN_LIMIT", 50)
+DAILY_BAN_LIMIT        = config.get("DAILY_BAN_LIMIT", 30)     # per source sub, sliding 24h; 0 = off
+HELD_BAN_REASON        = config.get("HELD_BAN_REASON", "Held for review: source over daily ban limit")
 MAX_LOG_AGE_MINUTES    = config.get("MAX_LOG_AGE_MINUTES", 600)
 ROW_RETENTION_DAYS     = config.get("ROW_RETENTION_DAYS", 10)
+ARCHIVE_INTERVAL_HOURS = config.get("ARCHIVE_INTERVAL_HOURS", 24)
+SHEET_FULL_RELOAD_MINUTES = config.get("SHEET_FULL_RELOAD_MINUTES", 60)   # full sheet compare, whatever modifiedTime says
+MAX_PENDING_SHEET_WRITES  = config.get("MAX_PENDING_SHEET_WRITES", 100)
+SHEET_SYNC_SECONDS        = config.get("SHEET_SYNC_SECONDS", 30)
+MOD_CACHE_TTL_MINUTES     = config.get("MOD_CACHE_TTL_MINUTES", 60)
+SNAPSHOT_RECONCILE_HOURS  = config.get("SNAPSHOT_RECONCILE_HOURS", 24)
+WORKER_COUNT              = config.get("WORKER_COUNT", 4)
+RATE_LIMIT_RESERVE        = config.get("RATE_LIMIT_RESERVE", 10)
+RETRY_MAX_ATTEMPTS        = config.get("RETRY_MAX_ATTEMPTS", 8)
+RETRY_BASE_SECONDS        = config.get("RETRY_BASE_SECONDS", 60)
+RETRY_MAX_SECONDS         = config.get("RETRY_MAX_SECONDS", 6 * 3600)
+LOG_FSYNC_EVERY           = config.get("LOG_FSYNC_EVERY", 20)
+PUBLIC_LOG_RECENT_ENTRIES = config.get("PUBLIC_LOG_RECENT_ENTRIES", 100)
+DAEMON_IDLE_SECONDS         = config.get("DAEMON_IDLE_SECONDS", 5)
+DAEMON_INBOX_POLL_SECONDS   = config.get("DAEMON_INBOX_POLL_SECONDS", 60)
+DAEMON_HOUSEKEEPING_SECONDS = config.get("DAEMON_HOUSEKEEPING_SECONDS", 600)
+METRICS_TEXTFILE            = config.get("METRICS_TEXTFILE", "")  # Prometheus textfile path, off if empty
 
 # --- Load trusted subs from file ---
 def load_trusted_subs(path="trusted_subs.txt"):
+    if not os.path.exists(path):
+        print(f"[WARN] {path} not found, no trusted subs configured.")
+        return []
     with open(path) as f:
         return [line.strip().lower() for line in f if line.strip()]
 
@@ -31,6 +63,9 @@ TRUSTED_SOURCES = {f"r/{sub}" for sub in TRUSTED_SUBS}
 
 # --- Google Sheets setup ---
 def setup_google_sheet():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
     creds_env = os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON')
     if not creds_env:
         raise SystemExit("[FATAL] Missing GOOGLE_SERVICE_ACCOUNT_JSON env var.")
@@ -56,6 +91,8 @@ def setup_google_sheet():
 
 # --- Reddit API setup ---
 def setup_reddit():
+    import praw
+
     return praw.Reddit(
         client_id=os.environ.get('REDDIT_CLIENT_ID') or os.environ.get('CLIENT_ID'),
         client_secret=os.environ.get('REDDIT_CLIENT_SECRET') or os.environ.get('CLIENT_SECRET'),
@@ -63,7 +100,3 @@ def setup_reddit():
         password=os.environ.get('REDDIT_PASSWORD') or os.environ.get('PASSWORD'),
         user_agent='Cross-Sub Ban Bot/1.0'
     )
-
-# --- Instantiate API clients here ---
-sheet, client, sheet_key = setup_google_sheet()
-reddit = setup_reddit()
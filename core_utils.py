@@ -1,38 +1,60 @@
-def is_mod(subreddit, user):
+import time
+from bot_config import MOD_CACHE_TTL_MINUTES, DAILY_BAN_LIMIT
+
+# --- Moderator list cache ---
+_MOD_CACHE = {}  # sub name -> (fetched_at, {mod names})
+MOD_CACHE_STATS = {"hits": 0, "misses": 0}
+
+def get_mod_set(subreddit, budget=None):
+    """
+    Return the lowercased moderator names of a subreddit, fetching the list
+    at most once per MOD_CACHE_TTL_MINUTES (after taking a token from
+    `budget`, if given).
+    """
+    key = str(subreddit.display_name).lower()
+    cached = _MOD_CACHE.get(key)
+    if cached and time.time() - cached[0] < MOD_CACHE_TTL_MINUTES * 60:
+        MOD_CACHE_STATS["hits"] += 1
+        return cached[1]
+    MOD_CACHE_STATS["misses"] += 1
+    if budget is not None:
+        budget.acquire()
+    mods = {m.name.lower() for m in subreddit.moderator()}
+    _MOD_CACHE[key] = (time.time(), mods)
+    return mods
+
+def invalidate_mod_cache(sub=None):
+    """
+    Drop the cached moderator list for one sub, or for all subs.
+    """
+    if sub is None:
+        _MOD_CACHE.clear()
+    else:
+        _MOD_CACHE.pop(str(sub).lower(), None)
+
+def is_mod(subreddit, user, budget=None):
     """
     Check if a given user is a moderator of the given subreddit.
     """
     try:
-        mod_list = {m.name.lower() for m in subreddit.moderator()}
-        return user.lower() in mod_list
+        return user.lower() in get_mod_set(subreddit, budget)
     except Exception:
         return False
 
-def is_forgiven(user, sheet_cache):
-    for r in sheet_cache:
-        if r.get('Username','').lower() == user.lower() and str(r.get('ManualOverride','')).lower() in ('yes','true'):
-            return True
-    return False
-
-def exempt_subs_for_user(user, sheet_cache):
-    for r in sheet_cache:
-        if r.get('Username','').lower() == user.lower():
-            field = str(r.get('ExemptSubs','')).lower()
-            if field:
-                return {sub.strip() for sub in field.split(',') if sub.strip()}
-    return set()
-
-def get_recent_sheet_entries(source_sub, sheet_cache):
-    from datetime import datetime, timedelta
-    cutoff = datetime.utcnow() - timedelta(days=1)
-    count = 0
-    for r in sheet_cache:
-        if r.get('SourceSub') == source_sub:
-            ts = r.get('Timestamp')
-            try:
-                t = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
-                if t > cutoff:
-                    count += 1
-            except:
-                pass
-    return count
+def is_forgiven(user, registry):
+    return registry.is_forgiven(user)
+
+def exempt_subs_for_user(user, registry):
+    return registry.exempt_subs(user)
+
+def recent_ban_count(registry, source_sub, at=None):
+    """
+    Number of sheet rows from a source sub in the day up to `at` (epoch
+    seconds, default now). Served by the registry's per-source time index,
+    which is built at load and kept current by every append.
+    """
+    at = time.time() if at is None else at
+    return registry.count_between(at - 86400, at + 1, source_sub)
+
+def over_daily_limit(registry, source_sub, at=None):
+    return bool(DAILY_BAN_LIMIT) and recent_ban_count(registry, source_sub, at) >= DAILY_BAN_LIMIT
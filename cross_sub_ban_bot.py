@@ -1,72 +1,116 @@
 #!/usr/bin/env python3
 
-import json
-import base64
-import os
 import sys
 import time
 import praw
 import prawcore
-import gspread
 import traceback
-import re
-from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime, timedelta
-from core_utils import (
-    is_mod,
-    is_forgiven,
-    exempt_subs_for_user,
-)
-from log_utils import log_public_action, flush_public_markdown_log
-from modmail_utils import check_modmail, apply_override, apply_exemption
+import signal
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from core_utils import is_mod, over_daily_limit, MOD_CACHE_STATS
+from log_utils import log_public_action, flush_public_markdown_log, close_public_log
+from modmail_utils import check_modmail
 from super import check_superuser_command
 from stats_utils import write_stats_sheet
+from archive_utils import archive_old_rows
+import sheet_utils
+from plan_utils import build_plan, print_plan, api_calls_for
+from rate_utils import paced
+from run_context import RunContext
+from registry_utils import TIMESTAMP_FORMAT, join_exemptions
+from replay_utils import Recorder
+from state_utils import save_state
 from bot_config import (
-    WORK_DIR,
-    PUBLIC_LOG_JSON,
-    PUBLIC_LOG_MD,
     CROSS_SUB_BAN_REASON,
-    EXEMPT_USERS,
     DAILY_BAN_LIMIT,
+    HELD_BAN_REASON,
+    EXEMPT_USERS,
     MAX_LOG_AGE_MINUTES,
-    ROW_RETENTION_DAYS,
     TRUSTED_SUBS,
     TRUSTED_SOURCES,
-    sheet,
-    client,
-    reddit,
-    sheet_key
+    WORKER_COUNT,
+    DAEMON_IDLE_SECONDS,
+    DAEMON_INBOX_POLL_SECONDS,
+    DAEMON_HOUSEKEEPING_SECONDS,
+    RUN_REPORT_PATH,
+    METRICS_TEXTFILE,
 )
 
 
-
-# --- Caches ---
-mod_cache = {}
-SHEET_CACHE = []
-
 # --- Helper Functions ---
 
-def load_sheet_cache():
-    global SHEET_CACHE
+def load_sheet_cache(ctx, full=False):
+    """
+    Fill ctx.registry from the local ban store. The sheet is only
+    downloaded in full the first time (empty store) or when full=True;
+    otherwise the sheet sync worker imports sheet edits in the background.
+    """
     try:
-        start = time.time()
-        SHEET_CACHE = sheet.get_all_records()
-        print(f"[DEBUG] Sheet load took {time.time() - start:.2f}s")
-        print(f"[INFO] Loaded {len(SHEET_CACHE)} rows into local cache.")
+        with ctx.metrics.phase("sheet_load"):
+            if full or not sheet_utils.load_registry(ctx.store, ctx.registry):
+                sheet_utils.full_load(ctx.sheet, ctx.registry, ctx.store)
     except Exception as e:
         print(f"[ERROR] Failed to load sheet cache: {e}")
-        SHEET_CACHE = []
+        if ctx.registry.loaded_at is None:
+            ctx.registry.load([])
+
+
+LISTING_CAP = 1000   # Reddit stops paging a listing after about this many items
+
+
+def fetch_new_modlog(ctx, sr, sub):
+    """
+    Return the banuser/unbanuser modlog entries of a sub newer than its
+    stored watermark, oldest first. Each page read takes a rate budget token.
+
+    Pages through the modlog (server-side filtered by action) for as long
+    as it takes to reach the watermark, so a busy sub is read completely.
+    Without a watermark, stops at MAX_LOG_AGE_MINUTES. Reddit serves at
+    most LISTING_CAP entries of a listing; if that runs out before the
+    watermark, the entries in between can't be read, which is reported
+    rather than passed over silently.
+    """
+    mark = ctx.modlog_watermarks.get(sub)
+    oldest = time.time() - MAX_LOG_AGE_MINUTES * 60
+    entries = []
+    for action in ("banuser", "unbanuser"):
+        read = 0
+        reached = not mark
+        for log in paced(sr.mod.log(action=action, limit=None), ctx.rate_budget):
+            if mark:
+                if log.id == mark["id"] or log.created_utc < mark["created_utc"]:
+                    reached = True
+                    break
+            elif log.created_utc < oldest:
+                break
+            entries.append(log)
+            read += 1
+        if not reached and read >= LISTING_CAP:
+            print(f"[WARN] r/{sub} {action} modlog ended before the last processed entry; "
+                  f"older entries since then could not be read.")
+    entries.sort(key=lambda l: l.created_utc)
+    return entries
+
 
 # --- Ban Sync ---
-def sync_bans_from_sub(sub):
+def sync_bans_from_sub(ctx, sub, entries=None):
+    """
+    Record new pact bans, forgiveness and exemptions from a sub's modlog.
+    `entries` (oldest first) can be passed in by the daemon's modlog
+    stream; otherwise they are fetched back to the stored watermark.
+    """
     print(f"[STEP] Checking modlog for r/{sub}")
     seen_user_sources = set()
 
     try:
-        sr = reddit.subreddit(sub)
+        sr = ctx.reddit.subreddit(sub)
 
-        print(f"[INFO] Scanning latest 200 mod actions for r/{sub}...")
-        for log in sr.mod.log(limit=200):  # includes both ban and unban actions
+        if entries is None:
+            entries = fetch_new_modlog(ctx, sr, sub)
+        print(f"[INFO] {len(entries)} new ban/unban actions in r/{sub} since last run.")
+        for log in entries:
             log_id = log.id
             mod = getattr(log.mod, 'name', 'unknown')
             action = log.action
@@ -83,51 +127,40 @@ def sync_bans_from_sub(sub):
                     print(f"[WARN] Skipping log {log_id} - No valid target user found")
                 continue
 
-            if datetime.utcnow() - ts > timedelta(minutes=MAX_LOG_AGE_MINUTES):
-                continue
-
             user_lc = user.strip().lower()
+            ctx.snapshots.apply_modlog(sub, log)
 
             # --- Handle UNBAN actions ---
             if action == "unbanuser":
                 # Match by username
-                matches = [
-                    (i, row)
-                    for i, row in enumerate(SHEET_CACHE, start=2)
-                    if row.get("Username", "").strip().lower() == user_lc
-                    and not row.get("ForgiveTimestamp", "").strip()
-                ]
-                if matches:
-                    row_num, row = matches[0]
-                    forgive_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-                    origin_sub = row.get("SourceSub", "").strip().lower()
-
-                    if origin_sub == source:
-                        # Mark as forgiven if unbanned by source sub
-                        print(f"[FORGIVE] u/{user} unbanned in {source} by {mod} – marking as forgiven.")
-                        try:
-                            sheet.update_cell(row_num, 5, "yes")
-                            sheet.update_cell(row_num, 7, mod)
-                            sheet.update_cell(row_num, 8, sub)
-                            sheet.update_cell(row_num, 9, forgive_time)
-                            SHEET_CACHE[row_num - 2]["ManualOverride"] = "yes"
-                            SHEET_CACHE[row_num - 2]["OverriddenBy"] = mod
-                            SHEET_CACHE[row_num - 2]["ModSub"] = sub
-                            SHEET_CACHE[row_num - 2]["ForgiveTimestamp"] = forgive_time
-                        except Exception as e:
-                            print(f"[ERROR] Failed to update forgiveness for u/{user}: {e}")
-                    else:
-                        # Otherwise treat it as an exemption
-                        print(f"[EXEMPT] u/{user} unbanned in r/{sub} (not origin sub {origin_sub}) – marking exemption.")
-                        try:
-                            current = str(row.get("ExemptSubs", "")).strip().lower()
-                            parts = {p.strip() for p in current.split(",") if p.strip()}
-                            parts.add(sub.lower())
-                            new_field = ', '.join(sorted(parts))
-                            sheet.update_cell(row_num, 10, new_field)
-                            SHEET_CACHE[row_num - 2]["ExemptSubs"] = new_field
-                        except Exception as e:
-                            print(f"[ERROR] Failed to update exemption for u/{user}: {e}")
+                with ctx.writer.lock:
+                    match = ctx.registry.first_unforgiven_row(user_lc)
+                    if match:
+                        row_num, record = match
+                        forgive_time = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+                        origin_sub = record.source
+
+                        if origin_sub == source:
+                            # Mark as forgiven if unbanned by source sub
+                            print(f"[FORGIVE] u/{user} unbanned in {source} by {mod} – marking as forgiven.")
+                            try:
+                                ctx.writer.update_row(
+                                    row_num,
+                                    ManualOverride="yes",
+                                    OverriddenBy=mod,
+                                    ModSub=sub,
+                                    ForgiveTimestamp=forgive_time,
+                                )
+                            except Exception as e:
+                                print(f"[ERROR] Failed to update forgiveness for u/{user}: {e}")
+                        else:
+                            # Otherwise treat it as an exemption
+                            print(f"[EXEMPT] u/{user} unbanned in r/{sub} (not origin sub {origin_sub}) – marking exemption.")
+                            try:
+                                new_field = join_exemptions(record.exemptions | {sub.lower()})
+                                ctx.writer.update_row(row_num, ExemptSubs=new_field)
+                            except Exception as e:
+                                print(f"[ERROR] Failed to update exemption for u/{user}: {e}")
                     continue
 
             # --- Handle BAN actions ---
@@ -142,228 +175,558 @@ def sync_bans_from_sub(sub):
                 print(f"[DEBUG] SKIP {log_id} for {user!r}: source {source!r} not trusted")
                 continue
 
-            if user_lc in EXEMPT_USERS or is_mod(sr, user):
+            if user_lc in EXEMPT_USERS or is_mod(sr, user, ctx.rate_budget):
                 continue
 
-            if user_lc in seen_user_sources or any(
-                r.get('Username', '').strip().lower() == user_lc for r in SHEET_CACHE
-            ):
-                print(f"[SKIP] Already logged user {user_lc} to sheet (from any sub)")
-                continue
-            seen_user_sources.add(user_lc)
+            with ctx.writer.lock:
+                if user_lc in seen_user_sources or ctx.registry.has_user(user_lc):
+                    print(f"[SKIP] Already logged user {user_lc} to sheet (from any sub)")
+                    continue
+                seen_user_sources.add(user_lc)
+
+                # A source past its daily limit may be compromised or
+                # runaway: log the ban, but hold it until someone reviews it.
+                held = over_daily_limit(ctx.registry, source, log.created_utc)
+                if held:
+                    print(f"[LIMIT] {source} reached {DAILY_BAN_LIMIT} bans in a day; "
+                          f"holding ban of u/{user} for review.")
+                    ctx.metrics.count("held_bans")
+
+                try:
+                    row_data = {
+                        'Username': user,
+                        'SourceSub': source,
+                        'Reason': HELD_BAN_REASON if held else CROSS_SUB_BAN_REASON,
+                        'Timestamp': ts.strftime(TIMESTAMP_FORMAT),
+                        'ModLogID': log_id,
+                        'OverriddenBy': mod,
+                    }
+                    print("[DEBUG] Queueing row:", row_data)
+                    ctx.writer.append_row(**row_data)
+                except Exception as e:
+                    print(f"[ERROR] FAILED to log user '{user}' to sheet for r/{sub}: {e}")
+                    traceback.print_exc()
+                    continue
 
-            try:
-                row_data = [
-                    user,
-                    source,
-                    CROSS_SUB_BAN_REASON,
-                    ts.strftime('%Y-%m-%d %H:%M:%S'),
-                    '',  # ManualOverride
-                    log_id,
-                    mod,
-                    '',  # ModSub
-                    '',  # ForgiveTimestamp
-                    ''   # ExemptSubs
-                ]
-                print("[DEBUG] About to append row:", row_data)
-                sheet.append_row(row_data, value_input_option='USER_ENTERED')
-            except Exception as e:
-                print(f"[ERROR] FAILED to log user '{user}' to sheet for r/{sub}: {e}")
-                traceback.print_exc()
-                continue
+            print(f"[LOGGED] {user} banned in {source} by {mod}" + (" (held)" if held else ""))
 
-            SHEET_CACHE.append({
-                'Username': user,
-                'SourceSub': source,
-                'Reason': CROSS_SUB_BAN_REASON,
-                'Timestamp': ts.strftime('%Y-%m-%d %H:%M:%S'),
-                'ManualOverride': '',
-                'ModLogID': log_id,
-                'Mod': mod,
-                'ModSub': '',
-                'ForgiveTimestamp': '',
-                'ExemptSubs': ''
-            })
-
-            print(f"[LOGGED] {user} banned in {source} by {mod}")
+        if entries:
+            newest = entries[-1]
+            ctx.modlog_watermarks[sub] = {"id": newest.id, "created_utc": newest.created_utc}
 
     except (prawcore.exceptions.Forbidden, prawcore.exceptions.NotFound):
         print(f"[WARN] Cannot access modlog for r/{sub}, skipping.")
 
 
 # --- Ban Enforcer ---
-def enforce_bans_on_sub(sub):
-    print(f"[STEP] Enforcing bans/unbans in r/{sub}")
-    action_was_taken_by_queue = False
-
-    try:
-        sr = reddit.subreddit(sub)
-        FETCH_LIMIT = 100
-        print(f"[INFO] Fetching the latest {FETCH_LIMIT} bans for r/{sub}...")
-        bans = {b.name.lower(): b for b in sr.banned(limit=FETCH_LIMIT)}
-        print(f"[INFO] Fetched {len(bans)} bans.")
-    except prawcore.exceptions.TooManyRequests:
-        print(f"[WARN] Hit rate limit fetching ban list for r/{sub}. Skipping enforcement for this sub.")
+def send_ban_dm(ctx, username, source_sub):
+    ctx.rate_budget.acquire()
+    ctx.reddit.redditor(username).message(
+        "You've been banned from NHL subreddits",
+        (
+            f"You were banned from {source_sub} for breaking subreddit rules. "
+            f"Because of the NHL cross-sub ban pact, this ban now applies to all participating team subs.\n\n"
+            f"If you think this was a mistake or want to appeal, message the mods of {source_sub}. "
+            f"If they forgive the ban, it will be automatically removed across the network.\n\n"
+            f"Don't message mods of other subs — they can’t help.\n\n"
+            f"This message was sent automatically by the bot that enforces the pact."
+        )
+    )
+
+
+def queue_ban_dm(ctx, username, source_sub):
+    """
+    Queue the ban notice for a user's pact ban. The source ban is
+    identified by the timestamp of its sheet row.
+    """
+    with ctx.writer.lock:
+        match = ctx.registry.row_for_user_source(username, source_sub)
+        event = match[1].get('Timestamp', '') if match else ''
+    ctx.dm_queue.add(username, source_sub, event or datetime.utcnow().strftime('%Y-%m-%d'))
+
+
+def send_queued_dms(ctx):
+    """
+    Send due ban notices, lowest priority: only while the rate budget has
+    room to spare after enforcement. What doesn't fit waits for later.
+    """
+    due = ctx.dm_queue.take_due()
+    if not due:
         return
+    print(f"[INFO] Sending up to {len(due)} queued ban notices...")
+    sent = 0
+    for key, notice in due:
+        username, source_sub = notice["username"], notice["source_sub"]
+        with ctx.writer.lock:
+            forgiven = ctx.registry.is_forgiven(username)
+        if forgiven:
+            ctx.dm_queue.dropped(key, "forgiven before the notice went out")
+            continue
+        if not ctx.rate_budget.has_spare():
+            print(f"[INFO] Rate budget reserved for enforcement; {len(due) - sent} notices left queued.")
+            break
+        try:
+            send_ban_dm(ctx, username, source_sub)
+            ctx.dm_queue.sent(key)
+            ctx.metrics.count("dm_sent")
+            sent += 1
+            print(f"[INFO] Sent ban notice to u/{username}.")
+        except prawcore.exceptions.TooManyRequests as e:
+            ctx.rate_budget.throttled()
+            ctx.dm_queue.failed(key, e)
+            break
+        except praw.exceptions.RedditAPIException as e:
+            # e.g. USER_DOESNT_EXIST, NOT_WHITELISTED_BY_USER_MESSAGE
+            print(f"[WARN] Could not DM u/{username}: {e}")
+            ctx.dm_queue.failed(key, e, retryable=False)
+        except Exception as e:
+            print(f"[WARN] Could not DM u/{username} ({type(e).__name__}): {e}")
+            ctx.dm_queue.failed(key, e)
+    ctx.dm_queue.save()
+
+
+def execute_action(ctx, sr, sub, action_type, username, source_sub, reason_note):
+    """
+    Perform one ban or unban. Raises whatever the API raised.
+    """
+    if action_type == 'unban':
+        ctx.rate_budget.acquire()
+        sr.banned.remove(username)
+        ctx.snapshots.record_unban(sub, username)
+        print(f"[UNBANNED] (Queued) u/{username} in r/{sub} ({reason_note})")
+        log_public_action("UNBANNED", username, sub, source_sub, "Bot (Queued)", reason_note)
+
+    elif action_type == 'ban':
+        ban_note = (
+            f"Cross-sub ban from {source_sub}. NHL subs share a pact to fight trolling. "
+            f"To appeal, message mods of {source_sub}, admit what you did, and promise to follow rules. "
+            f"If they forgive, a global unban will follow."
+        )
+        ctx.rate_budget.acquire()
+        sr.banned.add(username, ban_reason=CROSS_SUB_BAN_REASON, note=ban_note)
+        ctx.snapshots.record_ban(sub, username, f"{CROSS_SUB_BAN_REASON}: {ban_note}")
+        print(f"[BANNED] (Queued) u/{username} in r/{sub} from {source_sub}")
+        log_public_action("BANNED", username, sub, source_sub, "Bot (Queued)", "")
+
+        # One notice per source ban, however many subs enforce it;
+        # sent after enforcement by send_queued_dms().
+        queue_ban_dm(ctx, username, source_sub)
+
+
+def run_action(ctx, sr, sub, action_type, username, source_sub, reason_note, on_failure):
+    """
+    Execute an action and decide whether a failure is worth retrying.
+    Retryable failures are passed to on_failure(error). Returns True if the
+    action went through.
+    """
+    try:
+        execute_action(ctx, sr, sub, action_type, username, source_sub, reason_note)
+        return True
+
+    except prawcore.exceptions.TooManyRequests as e:
+        print(f"[WARN] Hit rate limit during queued action for u/{username} in r/{sub}. Pausing all workers...")
+        ctx.rate_budget.throttled()
+        on_failure(e)
+    except praw.exceptions.RedditAPIException as e:
+        print(f"[ERROR] Queued action API Error for u/{username} in r/{sub}: {e}")
+        for subexc in e.items:
+            if subexc.error_type == 'USER_DOESNT_EXIST':
+                print(f"[INFO] Skipping action for non-existent user u/{username}.")
+                break
+            elif subexc.error_type == 'SUBREDDIT_BAN_NOT_PERMITTED':
+                print(f"[WARN] Bot lacks permission to ban u/{username} in r/{sub}.")
+                break
+            elif subexc.error_type == 'USER_ALREADY_BANNED':
+                print(f"[INFO] Skipping ban, u/{username} already banned in r/{sub}.")
+                break
+        else:
+            on_failure(e)
     except Exception as e:
-        print(f"[ERROR] Cannot fetch ban list for r/{sub} ({type(e).__name__}): {e}")
-        import traceback
+        print(f"[ERROR] Unexpected error during queued action for u/{username} in r/{sub} ({type(e).__name__}): {e}")
         traceback.print_exc()
-        return
+        on_failure(e)
+    return False
 
-    all_rows = SHEET_CACHE
-    now = datetime.utcnow()
-    cutoff = now - timedelta(days=1)
 
-    actions_to_take = []
-    seen = set()
+def enforce_bans_on_sub(ctx, sub, actions_to_take):
+    """
+    Carry out this sub's slice of the run's enforcement plan.
+    """
+    print(f"[STEP] Enforcing bans/unbans in r/{sub}")
+    action_was_taken_by_queue = False
+    sr = ctx.reddit.subreddit(sub)
 
-    print(f"[INFO] Checking {len(all_rows)} sheet entries against r/{sub} ban list...")
-    for r in all_rows:
-        user = r.get('Username', '')
-        src = r.get('SourceSub', '')
-        ts_str = r.get('Timestamp', '')
-        if not user or not src or not ts_str:
-            continue
-        try:
-            entry_time = datetime.strptime(ts_str, '%Y-%m-%d %H:%M:%S')
-        except:
-            continue
-        if entry_time < cutoff:
-            continue
+    print(f"[INFO] Processing {len(actions_to_take)} queued actions for r/{sub}...")
+    for action_type, username, _, source_sub, reason_note in actions_to_take:
+        def queue_retry(error):
+            ctx.retry_queue.add(action_type, username, sub, source_sub, reason_note, error)
 
-        key = (user.lower(), src.lower())
-        if key in seen:
-            continue
-        seen.add(key)
+        if run_action(ctx, sr, sub, action_type, username, source_sub, reason_note, queue_retry):
+            action_was_taken_by_queue = True
 
-        ul = user.lower()
-        deleted_marker = str(r.get('ForgiveTimestamp', '')).strip()
-        if deleted_marker:
-            continue
+    if not action_was_taken_by_queue:
+        print(f"[INFO] No bans or unbans needed/performed via queue in r/{sub}.")
 
-        should_unban = False
-        unban_reason = ""
-        if is_forgiven(user, SHEET_CACHE):
-            should_unban = True
-            unban_reason = "Forgiven override"
-        elif sub.lower() in exempt_subs_for_user(user, SHEET_CACHE):
-            should_unban = True
-            unban_reason = "Per-sub exemption override"
-
-        if should_unban:
-            if ul in bans and CROSS_SUB_BAN_REASON.lower() in (getattr(bans.get(ul), 'note', '') or '').lower():
-                actions_to_take.append(('unban', user, src, unban_reason))
-            continue
 
-        if ul in EXEMPT_USERS or is_mod(sr, user):
+# --- Retry Queue ---
+def still_wanted(ctx, entry, sub):
+    """
+    Check that a queued retry still matches the registry and ban list,
+    so a user forgiven since the failure is not banned anyway.
+    """
+    user = entry["username"]
+    kind = entry["kind"]
+    if kind == 'ban':
+        with ctx.writer.lock:
+            if ctx.registry.is_forgiven(user) or sub.lower() in ctx.registry.exempt_subs(user):
+                return False
+        return not ctx.snapshots.is_banned(sub, user)
+    if kind == 'unban':
+        return not ctx.snapshots.has(sub) or ctx.snapshots.is_banned(sub, user)
+    return True
+
+
+def retry_on_sub(ctx, sub, entries):
+    sr = ctx.reddit.subreddit(sub)
+    for entry in entries:
+        if not still_wanted(ctx, entry, sub):
+            print(f"[RETRY] Dropping {entry['kind']} of u/{entry['username']} in r/{sub}, no longer needed.")
             continue
-
-        if ul in bans:
-            existing_note = getattr(bans[ul], 'note', '') or ''
-            if CROSS_SUB_BAN_REASON.lower() in existing_note.lower():
-                print(f"[SKIP] u/{user} already banned in r/{sub} with correct reason.")
-                continue
-
-        actions_to_take.append(('ban', user, src, ""))
-
-    print(f"[INFO] Processing {len(actions_to_take)} queued actions for r/{sub}...")
-    for action_type, username, source_sub, reason_note in actions_to_take:
+        run_action(ctx,
+            sr, sub, entry["kind"], entry["username"], entry["source_sub"], entry["reason"],
+            lambda error, entry=entry: ctx.retry_queue.restore(entry, error),
+        )
+
+
+def drain_retry_queue(ctx):
+    """
+    Retry every queued action that is due, before new work is planned.
+    """
+    due = ctx.retry_queue.take_due()
+    if not due:
+        return
+    print(f"[INFO] Retrying {len(due)} previously failed actions...")
+    ctx.metrics.count("retries", len(due))
+    by_sub = {}
+    for entry in due:
+        by_sub.setdefault(entry["sub"], []).append(entry)
+    run_per_sub(ctx, retry_on_sub, list(by_sub), {sub: (entries,) for sub, entries in by_sub.items()})
+    ctx.retry_queue.save()
+
+
+def run_per_sub(ctx, fn, subs, extra_args=None):
+    """
+    Run fn(ctx, sub, *extra_args[sub]) for every sub on a pool of
+    WORKER_COUNT threads. Requests are paced by ctx.rate_budget rather than
+    fixed sleeps.
+    """
+    phase = ctx.metrics.current_phase()
+
+    def call(sub):
+        start = time.perf_counter()
         try:
-            if action_type == 'unban':
-                sr.banned.remove(username)
-                print(f"[UNBANNED] (Queued) u/{username} in r/{sub} ({reason_note})")
-                log_public_action("UNBANNED", username, sub, source_sub, "Bot (Queued)", reason_note)
-                action_was_taken_by_queue = True
-
-            elif action_type == 'ban':
-                ban_note = (
-                    f"Cross-sub ban from {source_sub}. NHL subs share a pact to fight trolling. "
-                    f"To appeal, message mods of {source_sub}, admit what you did, and promise to follow rules. "
-                    f"If they forgive, a global unban will follow."
-                )
-                sr.banned.add(username, ban_reason=CROSS_SUB_BAN_REASON, note=ban_note)
-                print(f"[BANNED] (Queued) u/{username} in r/{sub} from {source_sub}")
-                log_public_action("BANNED", username, sub, source_sub, "Bot (Queued)", "")
-                action_was_taken_by_queue = True
-
-                # Send DM to the user once per full enforcement cycle (avoid spamming per sub)
-                reddit.redditor(username).message(
-                    "You've been banned from NHL subreddits",
-                    (
-                        f"You were banned from {source_sub} for breaking subreddit rules. "
-                        f"Because of the NHL cross-sub ban pact, this ban now applies to all participating team subs.\n\n"
-                        f"If you think this was a mistake or want to appeal, message the mods of {source_sub}. "
-                        f"If they forgive the ban, it will be automatically removed across the network.\n\n"
-                        f"Don't message mods of other subs — they can’t help.\n\n"
-                        f"This message was sent automatically by the bot that enforces the pact."
-                    )
-                )
-            time.sleep(2)
-
-        except prawcore.exceptions.TooManyRequests:
-            print(f"[WARN] Hit rate limit during queued action for u/{username} in r/{sub}. Sleeping longer...")
-            time.sleep(30)
-        except praw.exceptions.RedditAPIException as e:
-            print(f"[ERROR] Queued action API Error for u/{username} in r/{sub}: {e}")
-            for subexc in e.items:
-                if subexc.error_type == 'USER_DOESNT_EXIST':
-                    print(f"[INFO] Skipping action for non-existent user u/{username}.")
-                    break
-                elif subexc.error_type == 'SUBREDDIT_BAN_NOT_PERMITTED':
-                    print(f"[WARN] Bot lacks permission to ban u/{username} in r/{sub}.")
-                    break
-                elif subexc.error_type == 'USER_ALREADY_BANNED':
-                    print(f"[INFO] Skipping ban, u/{username} already banned in r/{sub}.")
-                    break
+            fn(ctx, sub, *(extra_args or {}).get(sub, ()))
         except Exception as e:
-            print(f"[ERROR] Unexpected error during queued action for u/{username} in r/{sub} ({type(e).__name__}): {e}")
-            import traceback
+            print(f"[ERROR] {fn.__name__} failed for r/{sub} ({type(e).__name__}): {e}")
             traceback.print_exc()
+        finally:
+            ctx.metrics.time_sub(phase, sub, time.perf_counter() - start)
 
-    if not action_was_taken_by_queue:
-        print(f"[INFO] No bans or unbans needed/performed via queue in r/{sub}.")
+    if WORKER_COUNT <= 1:
+        for sub in subs:
+            call(sub)
+        return
+    ctx.prepare_workers()
+    with ThreadPoolExecutor(max_workers=WORKER_COUNT) as pool:
+        list(pool.map(call, subs))
+
+# --- Run phases ---
+
+def enforce_all(ctx):
+    """
+    Retry what is due, plan enforcement across all subs and carry it out,
+    then send ban notices with whatever rate budget is left.
+    """
+    with ctx.metrics.phase("enforce"):
+        drain_retry_queue(ctx)
+
+        print("[INFO] Planning enforcement...")
+        plan = build_plan(ctx.registry, ctx.snapshots, ctx.reddit, TRUSTED_SUBS,
+                          budget=ctx.rate_budget, lock=ctx.writer.lock)
+        print(f"[INFO] Plan has {len(plan)} actions needing {api_calls_for(plan)} API calls.")
+
+        print("[INFO] Starting ban enforcement phase...")
+        plan_by_sub = {s: ([a for a in plan if a.sub == s],) for s in TRUSTED_SUBS}
+        run_per_sub(ctx, enforce_bans_on_sub, TRUSTED_SUBS, plan_by_sub)
+        drain_retry_queue(ctx)
+        print("[INFO] Enforcement phase complete.")
+    with ctx.metrics.phase("dm"):
+        send_queued_dms(ctx)
+
+
+def save_run_state(ctx):
+    """
+    Flush pending sheet writes and persist everything kept between runs.
+    """
+    ctx.flush_writes()
+    save_state("modlog_watermarks", ctx.modlog_watermarks)
+    save_state("modmail_watermarks", ctx.modmail_watermarks)
+    ctx.retry_queue.save()
+    ctx.dm_queue.save()
+    ctx.snapshots.save()
+
+
+def archive_phase(ctx):
+    """
+    Archive old sheet rows when due. A failure here never stops the run.
+    """
+    try:
+        with ctx.metrics.phase("archive"):
+            archive_old_rows(ctx)
+    except Exception as e:
+        print(f"[ERROR] Archiving old sheet rows failed: {e}")
 
-# --- Main ---
 
-if __name__ == '__main__':
-    print("=== Running Cross-Sub Ban Bot ===")
+def stats_phase(ctx):
+    """
+    Bring the Stats worksheet up to date. A failure here never stops the run.
+    """
+    try:
+        with ctx.metrics.phase("stats"):
+            write_stats_sheet(ctx)
+    except Exception as e:
+        print(f"[ERROR] Writing the stats sheet failed: {e}")
 
-    print("[INFO] Loading sheet cache...")
-    load_sheet_cache()
-    print("[INFO] Sheet cache loaded.")
-    
+
+def run_once(ctx):
+    """
+    One full cron-style pass: modmail, superuser commands, sync, enforcement.
+    """
     print("[INFO] Checking modmail threads...")
-    check_modmail()  # Modmail check already loops internally
+    with ctx.metrics.phase("modmail"):
+        check_modmail(ctx)  # Modmail check already loops internally
+        ctx.flush_writes()
+        save_state("modmail_watermarks", ctx.modmail_watermarks)
     print("[INFO] Modmail check complete.")
     
     print("[INFO] Checking for superuser modmail commands...")
-    check_superuser_command()  # <-- Indented properly
+    with ctx.metrics.phase("superuser"):
+        check_superuser_command(ctx)
 
     print("[INFO] Starting ban sync phase...")
-    for s in TRUSTED_SUBS:
-        print(f"\n=== [SYNC] Processing r/{s} ===")
-        load_sheet_cache()
-        sync_bans_from_sub(s)
-        print(f"[INFO] Pausing briefly after checking r/{s} modlog...")
-        time.sleep(2) 
-        
-    print("[INFO] Sync phase complete. Pausing before enforcement phase...")
-    time.sleep(15) 
-
-    print("[INFO] Starting ban enforcement phase...")
-    
-    for s in TRUSTED_SUBS:
-        enforce_bans_on_sub(s)
-        # --- DELAY 2 ---
-        print(f"[INFO] Pausing after enforcing bans in r/{s}...")
-        time.sleep(3) # Pause for 3 seconds (maybe slightly longer)
-        
-    print("[INFO] Enforcement phase complete.")
-    
-    flush_public_markdown_log()
-    
-    print("=== Bot run complete ===")
-    
-    write_stats_sheet(SHEET_CACHE, client, sheet_key)
+    with ctx.metrics.phase("sync"):
+        run_per_sub(ctx, sync_bans_from_sub, TRUSTED_SUBS)
+        ctx.flush_writes()
+        save_state("modlog_watermarks", ctx.modlog_watermarks)
+    print("[INFO] Sync phase complete.")
+
+    enforce_all(ctx)
+    save_run_state(ctx)
+    with ctx.metrics.phase("log_flush"):
+        flush_public_markdown_log()
+
+
+def run_daemon(ctx):
+    """
+    Stay running and react to modlog and modmail events as they happen.
+
+    Starts with one full pass to catch up, then follows the combined
+    modlog (ban/unban only) and modmail streams of all trusted subs. A pact
+    ban is synced and enforced within seconds. Modmail replies, superuser
+    commands, retries, sheet refreshes, stats and state saves run on timers. SIGINT/SIGTERM stop the
+    loop after the current step and flush all state.
+    """
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"[INFO] Received signal {signum}, shutting down after the current step...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    # The streams are opened (and their backlog skipped) before the catch-up
+    # pass, so nothing that happens while it runs is missed. Entries the pass
+    # already handled are dropped against the modlog watermarks.
+    streams = open_streams(ctx)
+    try:
+        daemon_step("Catch-up pass", run_once, ctx)
+        last_housekeeping = last_inbox = time.time()
+        catch_up = set()   # subs whose modlog must be re-read to the watermark
+        print("[INFO] Daemon is watching modlog and modmail streams.")
+
+        while not stop.is_set():
+            modlog_by_sub = {}
+            modmail_subs = set()
+            try:
+                for name, stream in streams.items():
+                    for item in stream:
+                        if item is None:
+                            break
+                        if name == "modmail":
+                            modmail_subs.add(str(item.owner.display_name).lower())
+                        else:
+                            modlog_by_sub.setdefault(str(item.subreddit).lower(), []).append(item)
+            except Exception as e:
+                # A failed poll ends the generator; start over and fetch
+                # whatever was missed back to the watermarks.
+                print(f"[WARN] Stream error, reopening streams: {e}")
+                stop.wait(DAEMON_IDLE_SECONDS)
+                try:
+                    streams = open_streams(ctx)
+                except Exception as e:
+                    print(f"[ERROR] Could not reopen streams: {e}")
+                    continue
+                catch_up.update(TRUSTED_SUBS)
+                modmail_subs = set(TRUSTED_SUBS)
+            modlog_by_sub.update((sub, None) for sub in catch_up)
+            catch_up.clear()
+
+            if modmail_subs:
+                with ctx.metrics.phase("modmail"):
+                    daemon_step("Modmail check", check_modmail, ctx, sorted(modmail_subs & set(TRUSTED_SUBS)))
+            if modlog_by_sub:
+                with ctx.metrics.phase("sync"):
+                    for sub, entries in modlog_by_sub.items():
+                        if sub in TRUSTED_SUBS:
+                            if entries is not None:
+                                entries = unseen_modlog(ctx, sub, entries)
+                            if not daemon_step(f"Sync of r/{sub}", sync_bans_from_sub, ctx, sub, entries):
+                                # Its watermark didn't move; read the modlog next time.
+                                catch_up.add(sub)
+            if modmail_subs or modlog_by_sub:
+                ctx.flush_writes()
+                daemon_step("Enforcement", enforce_all, ctx)
+
+            now = time.time()
+            if now - last_inbox >= DAEMON_INBOX_POLL_SECONDS:
+                with ctx.metrics.phase("modmail"):
+                    daemon_step("Modmail check", check_modmail, ctx)
+                with ctx.metrics.phase("superuser"):
+                    daemon_step("Superuser command check", check_superuser_command, ctx)
+                last_inbox = now
+            if now - last_housekeeping >= DAEMON_HOUSEKEEPING_SECONDS:
+                daemon_step("Enforcement", enforce_all, ctx)
+                daemon_step("Saving state", save_run_state, ctx)
+                with ctx.metrics.phase("log_flush"):
+                    daemon_step("Public log flush", flush_public_markdown_log)
+                archive_phase(ctx)
+                stats_phase(ctx)
+                daemon_step("Metrics write", ctx.metrics.write, RUN_REPORT_PATH, METRICS_TEXTFILE)
+                last_housekeeping = now
+
+            if not modmail_subs and not modlog_by_sub:
+                stop.wait(DAEMON_IDLE_SECONDS)
+    finally:
+        print("[INFO] Daemon stopping, saving state...")
+        save_run_state(ctx)
+        ctx.close()
+        flush_public_markdown_log()
+        close_public_log()
+        ctx.metrics.write(RUN_REPORT_PATH, METRICS_TEXTFILE)
+
+
+def daemon_step(label, fn, *args):
+    """
+    Run one step of the daemon loop. An error is logged and the daemon goes
+    on, as run_per_sub does for a single sub in cron mode. Returns whether
+    the step succeeded.
+    """
+    try:
+        fn(*args)
+        return True
+    except Exception as e:
+        print(f"[ERROR] {label} failed ({type(e).__name__}): {e}")
+        traceback.print_exc()
+        return False
+
+
+def open_streams(ctx):
+    """
+    Open the daemon's modlog and modmail streams and skip past what is
+    already there, so the first poll only returns new events.
+    """
+    multi = ctx.reddit.subreddit("+".join(TRUSTED_SUBS))
+    first = ctx.reddit.subreddit(TRUSTED_SUBS[0])
+    streams = {
+        "banuser": multi.mod.stream.log(action="banuser", pause_after=0, skip_existing=True),
+        "unbanuser": multi.mod.stream.log(action="unbanuser", pause_after=0, skip_existing=True),
+        # Only yields new conversations; replies in old threads are picked
+        # up by the periodic modmail check.
+        "modmail": first.mod.stream.modmail_conversations(
+            other_subreddits=TRUSTED_SUBS[1:], pause_after=0, skip_existing=True
+        ),
+    }
+    for stream in streams.values():
+        for item in stream:
+            if item is None:
+                break
+    return streams
+
+
+def unseen_modlog(ctx, sub, entries):
+    """
+    Drop stream entries at or before the sub's modlog watermark.
+    """
+    mark = ctx.modlog_watermarks.get(sub)
+    if not mark:
+        return entries
+    return [log for log in entries
+            if log.id != mark["id"] and log.created_utc >= mark["created_utc"]]
+
+
+# --- Main ---
+
+def main(argv, ctx=None):
+    """
+    Run the bot as the command line asks. `ctx` can be passed in with
+    clients already attached (the replay harness does this).
+    """
+    print("=== Running Cross-Sub Ban Bot ===")
+    ctx = ctx or RunContext()
+    plan_only = "--plan-only" in argv
+    daemon = "--daemon" in argv
+    if "--record" in argv:
+        # Save every Reddit and Sheets response of this run for offline replay.
+        ctx.recorder = Recorder(argv[argv.index("--record") + 1], argv)
+
+    print("[INFO] Loading sheet cache...")
+    load_sheet_cache(ctx, full="--full-reload" in argv)
+    print("[INFO] Sheet cache loaded.")
+
+    try:
+        if plan_only:
+            # Show what enforcement would do right now, without changing anything.
+            sheet_utils.refresh(ctx.sheet, ctx.registry, ctx.store, ctx.writer.lock)
+            print_plan(build_plan(ctx.registry, ctx.snapshots, ctx.reddit, TRUSTED_SUBS,
+                                  budget=ctx.rate_budget, lock=ctx.writer.lock))
+            ctx.snapshots.save()
+            return
+
+        ctx.start_sheet_sync()
+
+        if daemon:
+            run_daemon(ctx)
+            return
+
+        run_once(ctx)
+        archive_phase(ctx)
+        stats_phase(ctx)
+        ctx.close()
+        ctx.metrics.write(RUN_REPORT_PATH, METRICS_TEXTFILE)
+
+        print(f"[INFO] Moderator cache: {MOD_CACHE_STATS['hits']} hits, {MOD_CACHE_STATS['misses']} misses.")
+        print("=== Bot run complete ===")
+    finally:
+        # Pushes whatever the sheet sync worker has not; it is a daemon
+        # thread and would otherwise die with the process.
+        try:
+            ctx.close()
+        finally:
+            if ctx.recorder is not None:
+                ctx.recorder.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
     sys.exit(0)
@@ -0,0 +1,101 @@
+import time
+import random
+import threading
+from bot_config import RETRY_MAX_ATTEMPTS, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS, ROW_RETENTION_DAYS
+from state_utils import load_state, save_state
+
+
+class DMQueue:
+    """
+    Durable queue of ban notification DMs, one per user per source ban.
+
+    A pact ban is carried out in every participating sub, but the user
+    should hear about it once. Notices are keyed by user, source sub and
+    the time of the source ban, so queuing the same one from 30 subs (or
+    from the next run) is a no-op. The queue is sent after bans and unbans,
+    and each notice keeps its delivery state: pending, sent, failed or
+    dropped. Finished notices are forgotten after ROW_RETENTION_DAYS.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.notices = load_state("dm_queue", {})
+
+    @staticmethod
+    def key(username, source_sub, event):
+        return f"{username.lower()}|{source_sub.lower()}|{event}"
+
+    def save(self):
+        with self.lock:
+            self._prune()
+            save_state("dm_queue", self.notices)
+
+    def _prune(self):
+        cutoff = time.time() - ROW_RETENTION_DAYS * 86400
+        self.notices = {
+            k: n for k, n in self.notices.items()
+            if n["status"] == "pending" or n["updated"] >= cutoff
+        }
+
+    def add(self, username, source_sub, event):
+        """
+        Queue a ban notice unless this ban was already notified or queued.
+        Returns True if it was newly queued.
+        """
+        key = self.key(username, source_sub, event)
+        with self.lock:
+            if key in self.notices:
+                return False
+            self.notices[key] = {
+                "username": username,
+                "source_sub": source_sub,
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt": 0,
+                "updated": time.time(),
+            }
+            return True
+
+    def take_due(self):
+        """
+        Return [(key, notice)] for pending notices whose send time has come,
+        oldest first.
+        """
+        now = time.time()
+        with self.lock:
+            due = [(k, n) for k, n in self.notices.items()
+                   if n["status"] == "pending" and n["next_attempt"] <= now]
+        return sorted(due, key=lambda kn: kn[1]["updated"])
+
+    def _set_status(self, key, status, error=None):
+        notice = self.notices[key]
+        notice["status"] = status
+        notice["updated"] = time.time()
+        if error is not None:
+            notice["last_error"] = str(error)
+
+    def sent(self, key):
+        with self.lock:
+            self._set_status(key, "sent")
+
+    def dropped(self, key, why):
+        with self.lock:
+            self._set_status(key, "dropped", why)
+
+    def failed(self, key, error, retryable=True):
+        """
+        Record a failed send: back off and try again later, or give up
+        after RETRY_MAX_ATTEMPTS (or at once if not retryable).
+        """
+        with self.lock:
+            notice = self.notices[key]
+            notice["attempts"] += 1
+            if not retryable or notice["attempts"] >= RETRY_MAX_ATTEMPTS:
+                self._set_status(key, "failed", error)
+                print(f"[ERROR] Giving up on ban notice to u/{notice['username']} "
+                      f"after {notice['attempts']} attempts: {error}")
+                return
+            delay = min(RETRY_BASE_SECONDS * 2 ** (notice["attempts"] - 1), RETRY_MAX_SECONDS)
+            notice["next_attempt"] = time.time() + delay * random.uniform(0.5, 1.5)
+            notice["last_error"] = str(error)
+            print(f"[RETRY] Ban notice to u/{notice['username']} failed, retry in ~{delay:.0f}s.")
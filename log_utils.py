@@ -1,9 +1,53 @@
 import os
 import json
+import atexit
+import threading
 from datetime import datetime
-from bot_config import PUBLIC_LOG_JSON, PUBLIC_LOG_MD
+from bot_config import (
+    PUBLIC_LOG_JSON,
+    PUBLIC_LOG_JSONL,
+    PUBLIC_LOG_MD,
+    PUBLIC_LOG_ARCHIVE_DIR,
+    PUBLIC_LOG_RENDER_STATE,
+    PUBLIC_LOG_RECENT_ENTRIES,
+    LOG_FSYNC_EVERY,
+)
+
+_log_lock = threading.Lock()  # enforcement workers log from several threads
+_log_file = None
+_unsynced = 0
+
+def _migrate_json_log():
+    """
+    One-time conversion of the old JSON-array log into the line-per-entry log.
+    """
+    if os.path.exists(PUBLIC_LOG_JSONL) or not os.path.exists(PUBLIC_LOG_JSON):
+        return
+    try:
+        with open(PUBLIC_LOG_JSON, 'r') as f:
+            entries = json.load(f)
+    except json.JSONDecodeError:
+        print(f"[WARN] {PUBLIC_LOG_JSON} exists but is invalid. Not migrating it.")
+        return
+    tmp = f"{PUBLIC_LOG_JSONL}.tmp"
+    with open(tmp, 'w') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, PUBLIC_LOG_JSONL)
+    os.remove(PUBLIC_LOG_JSON)
+    print(f"[INFO] Migrated {len(entries)} entries from {PUBLIC_LOG_JSON} to {PUBLIC_LOG_JSONL}.")
+
+def _open_log():
+    global _log_file
+    if _log_file is None:
+        _migrate_json_log()
+        _log_file = open(PUBLIC_LOG_JSONL, 'a')
+    return _log_file
 
 def log_public_action(action, username, subreddit, source_sub="", actor="", note=""):
+    global _unsynced
     entry = {
         "timestamp": datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
         "action": action,
@@ -14,47 +58,161 @@ def log_public_action(action, username, subreddit, source_sub="", actor="", note
         "note": note
     }
     try:
-        data = []
-        if os.path.exists(PUBLIC_LOG_JSON):
+        with _log_lock:
+            f = _open_log()
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            _unsynced += 1
+            if _unsynced >= LOG_FSYNC_EVERY:
+                os.fsync(f.fileno())
+                _unsynced = 0
+
+        print(f"[INFO] Logged public action: {entry}")
+
+    except Exception as e:
+        print(f"[ERROR] Failed to write to public ban log: {e}")
+
+def close_public_log():
+    """
+    Sync and close the public log. Safe to call more than once.
+    """
+    global _log_file, _unsynced
+    with _log_lock:
+        if _log_file is None:
+            return
+        try:
+            _log_file.flush()
+            os.fsync(_log_file.fileno())
+            _log_file.close()
+        except Exception as e:
+            print(f"[ERROR] Failed to close public ban log: {e}")
+        _log_file = None
+        _unsynced = 0
+
+atexit.register(close_public_log)
+
+def iter_public_log(path=PUBLIC_LOG_JSONL):
+    """
+    Yield public log entries one at a time without loading the whole file.
+    A half-written last line (from a crash) is skipped.
+    """
+    if path == PUBLIC_LOG_JSONL:
+        with _log_lock:
+            _migrate_json_log()
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
             try:
-                with open(PUBLIC_LOG_JSON, 'r') as f:
-                    data = json.load(f)
+                yield json.loads(line)
             except json.JSONDecodeError:
-                print(f"[WARN] {PUBLIC_LOG_JSON} exists but is invalid. Starting fresh.")
-                data = []
+                print(f"[WARN] Skipping unreadable line in {path}")
 
-        data.append(entry)
-        with open(PUBLIC_LOG_JSON, 'w') as f:
-            json.dump(data, f, indent=2)
+def _entry_markdown(entry):
+    symbol = "✅" if entry['action'] == 'UNBANNED' else "❌"
+    lines = [f"### [{entry['timestamp']}] {symbol} {entry['action']} u/{entry['username']}\n"]
+    lines.append(f"- **Subreddit**: r/{entry['subreddit']}\n")
+    if entry.get('source_sub'):
+        lines.append(f"- **Source Sub**: {entry['source_sub']}\n")
+    if entry.get('actor'):
+        lines.append(f"- **Actor**: {entry['actor']}\n")
+    if entry.get('note'):
+        lines.append(f"- **Note**: {entry['note']}\n")
+    lines.append("\n")
+    return "".join(lines)
 
-        print(f"[INFO] Logged public action: {entry}")
+def _load_render_state():
+    try:
+        with open(PUBLIC_LOG_RENDER_STATE, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"offset": 0, "recent": []}
 
-    except Exception as e:
-        print(f"[ERROR] Failed to write to public ban log JSON: {e}")
+def _save_render_state(state):
+    tmp = f"{PUBLIC_LOG_RENDER_STATE}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, PUBLIC_LOG_RENDER_STATE)
+
+def _read_new_entries(offset):
+    """
+    Return (entries, new_offset) for complete lines after byte `offset`.
+    """
+    entries = []
+    with open(PUBLIC_LOG_JSONL, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # still being written; pick it up next time
+            offset += len(line)
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"[WARN] Skipping unreadable line in {PUBLIC_LOG_JSONL}")
+    return entries, offset
 
 def flush_public_markdown_log():
+    """
+    Render public log entries added since the last flush.
+
+    New entries are appended to a monthly archive page
+    (public_ban_log/YYYY-MM.md). public_ban_log.md is rewritten as a small
+    index of the most recent entries plus links to the archives, so the
+    work per run depends on the number of new entries, not on history.
+    """
+    close_public_log()
     try:
-        if os.path.exists(PUBLIC_LOG_JSON):
-            with open(PUBLIC_LOG_JSON, 'r') as f:
-                entries = json.load(f)
-        else:
-            entries = []
+        with _log_lock:
+            _migrate_json_log()
+        if not os.path.exists(PUBLIC_LOG_JSONL):
+            return
+        os.makedirs(PUBLIC_LOG_ARCHIVE_DIR, exist_ok=True)
+        state = _load_render_state()
+        if os.path.getsize(PUBLIC_LOG_JSONL) < state["offset"]:
+            print("[WARN] Public log is shorter than last rendered; re-rendering archives.")
+            for name in os.listdir(PUBLIC_LOG_ARCHIVE_DIR):
+                if name.endswith(".md"):
+                    os.remove(os.path.join(PUBLIC_LOG_ARCHIVE_DIR, name))
+            state = {"offset": 0, "recent": []}
+
+        entries, state["offset"] = _read_new_entries(state["offset"])
+        if not entries and os.path.exists(PUBLIC_LOG_MD):
+            return  # nothing new; leave the pages (and the git diff) alone
+
+        by_month = {}
+        for entry in entries:
+            by_month.setdefault(str(entry.get('timestamp', ''))[:7] or "unknown", []).append(entry)
+        for month, month_entries in by_month.items():
+            path = os.path.join(PUBLIC_LOG_ARCHIVE_DIR, f"{month}.md")
+            is_new = not os.path.exists(path)
+            with open(path, 'a') as f:
+                if is_new:
+                    f.write(f"# NHL Cross-Sub Ban Log – {month}\n\n")
+                    f.write("[Back to the latest entries](../public_ban_log.md)\n\n---\n\n")
+                for entry in month_entries:
+                    f.write(_entry_markdown(entry))
+
+        state["recent"] = (state["recent"] + entries)[-PUBLIC_LOG_RECENT_ENTRIES:]
+        months = sorted(
+            (name[:-3] for name in os.listdir(PUBLIC_LOG_ARCHIVE_DIR) if name.endswith(".md")),
+            reverse=True,
+        )
+        archive_link = os.path.basename(PUBLIC_LOG_ARCHIVE_DIR)
 
         with open(PUBLIC_LOG_MD, 'w') as f:
             f.write("# NHL Cross-Sub Ban Log\n\n")
             f.write("This file is auto-generated by the bot.\n\n")
             f.write(f"Last updated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n\n")
+            if months:
+                f.write("Archives: " + " · ".join(f"[{m}]({archive_link}/{m}.md)" for m in months) + "\n\n")
             f.write("---\n\n")
-            for entry in entries:
-                symbol = "✅" if entry['action'] == 'UNBANNED' else "❌"
-                f.write(f"### [{entry['timestamp']}] {symbol} {entry['action']} u/{entry['username']}\n")
-                f.write(f"- **Subreddit**: r/{entry['subreddit']}\n")
-                if entry.get('source_sub'):
-                    f.write(f"- **Source Sub**: {entry['source_sub']}\n")
-                if entry.get('actor'):
-                    f.write(f"- **Actor**: {entry['actor']}\n")
-                if entry.get('note'):
-                    f.write(f"- **Note**: {entry['note']}\n")
-                f.write("\n")
+            for entry in state["recent"]:
+                f.write(_entry_markdown(entry))
+
+        _save_render_state(state)
+        print(f"[INFO] Rendered {len(entries)} new public log entries.")
     except Exception as e:
         print(f"[ERROR] Failed to flush public ban markdown log: {e}")
@@ -1,14 +1,4 @@
-from bot_config import (
-    CROSS_SUB_BAN_REASON,
-    EXEMPT_USERS,
-    DAILY_BAN_LIMIT,
-    MAX_LOG_AGE_MINUTES,
-    ROW_RETENTION_DAYS,
-    TRUSTED_SUBS,
-    TRUSTED_SOURCES,
-    setup_google_sheet,
-    setup_reddit
-)
+from run_context import RunContext
 
-sheet, client = setup_google_sheet()
-reddit = setup_reddit()
+# API clients are created on first use, e.g. ctx.reddit or ctx.sheet.
+ctx = RunContext()
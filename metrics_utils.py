@@ -0,0 +1,222 @@
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Turn request paths into endpoint names, e.g. "r/habs/about/banned/" ->
+# "r/{sub}/about/banned/", so calls can be grouped and counted.
+_REDDIT_PATTERNS = [
+    (re.compile(r"^/?r/([^/]+)/"), "r/{sub}/"),
+    (re.compile(r"^/?(user|api/v1/user)/[^/]+/"), r"\1/{name}/"),
+    (re.compile(r"/conversations/[^/]+"), "/conversations/{id}"),
+]
+_SHEETS_PATTERNS = [
+    (re.compile(r"^.*/drive/v3/files/[^/?]+"), "drive/files/{id}"),
+    (re.compile(r"^.*/spreadsheets/[^/:]+"), ""),
+    (re.compile(r"/values/[^/:?]+"), "/values/{range}"),   # gspread URL-quotes the range
+    (re.compile(r"\?.*$"), ""),
+]
+
+
+def wrap_reddit_requests(reddit, wrap):
+    """
+    Replace the request method of each of praw's prawcore sessions
+    (authorized, read-only, current; often the same object) with
+    wrap(original request), once per session.
+    """
+    seen = set()
+    for attr in ("_core", "_authorized_core", "_read_only_core"):
+        core = getattr(reddit, attr, None)
+        if core is None or id(core) in seen:
+            continue
+        seen.add(id(core))
+        core.request = wrap(core.request)
+
+
+class RunMetrics:
+    """
+    Timings and API call counts for one bot process.
+
+    Records wall time per phase (and per sub inside a phase), and counts
+    every Reddit and Sheets request by endpoint, by the phase it was made
+    in, and by sub, along with 429 responses. Requests are counted by
+    wrapping the clients' request methods, so no call site has to know.
+
+    Worker threads share the main thread's current phase; a thread that
+    opens its own phase (the sheet sync worker) is counted under that.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self._owner = threading.current_thread()
+        self._main_stack = []
+        self._local = threading.local()
+        self.phases = {}           # phase -> {"seconds", "runs"}
+        self.sub_seconds = {}      # phase -> {sub: seconds}
+        self.calls = {}            # service -> {endpoint: count}
+        self.calls_by_phase = {}   # phase -> {service: count}
+        self.calls_by_sub = {}     # sub -> count (Reddit)
+        self.rate_limited = {}     # service -> 429 count
+        self.counters = {}         # free-form counters, e.g. retries
+
+    def _stack(self):
+        if threading.current_thread() is self._owner:
+            return self._main_stack
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_phase(self):
+        stack = self._stack() or self._main_stack
+        return stack[-1] if stack else "startup"
+
+    @contextmanager
+    def phase(self, name):
+        stack = self._stack()
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with self.lock:
+                entry = self.phases.setdefault(name, {"seconds": 0.0, "runs": 0})
+                entry["seconds"] += elapsed
+                entry["runs"] += 1
+
+    def time_sub(self, phase, sub, seconds):
+        with self.lock:
+            subs = self.sub_seconds.setdefault(phase, {})
+            subs[sub] = subs.get(sub, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_call(self, service, endpoint, sub=None, rate_limited=False):
+        phase = self.current_phase()
+        with self.lock:
+            by_endpoint = self.calls.setdefault(service, {})
+            by_endpoint[endpoint] = by_endpoint.get(endpoint, 0) + 1
+            by_service = self.calls_by_phase.setdefault(phase, {})
+            by_service[service] = by_service.get(service, 0) + 1
+            if sub:
+                self.calls_by_sub[sub] = self.calls_by_sub.get(sub, 0) + 1
+            if rate_limited:
+                self.rate_limited[service] = self.rate_limited.get(service, 0) + 1
+
+    # --- Client instrumentation ---
+
+    def instrument_reddit(self, reddit):
+        """
+        Count every request praw sends through its prawcore session(s).
+        """
+        wrap_reddit_requests(reddit, lambda request: self._wrap(request, "reddit", _reddit_endpoint))
+
+    def instrument_sheets(self, client):
+        """
+        Count every request gspread sends (HTTPClient in gspread 6,
+        Client.request before that).
+        """
+        target = getattr(client, "http_client", client)
+        target.request = self._wrap(target.request, "sheets", _sheets_endpoint)
+
+    def _wrap(self, request, service, endpoint_of):
+        def counted(method, path, *args, **kwargs):
+            endpoint, sub = endpoint_of(str(path))
+            endpoint = f"{str(method).upper()} {endpoint}"
+            try:
+                result = request(method, path, *args, **kwargs)
+            except Exception as e:
+                self.record_call(service, endpoint, sub, rate_limited=_is_429(e))
+                raise
+            self.record_call(service, endpoint, sub)
+            return result
+        return counted
+
+    # --- Reports ---
+
+    def report(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "wall_seconds": round(time.time() - self.started_at, 3),
+                "phases": {k: {"seconds": round(v["seconds"], 3), "runs": v["runs"]}
+                           for k, v in self.phases.items()},
+                "sub_seconds": {p: {s: round(t, 3) for s, t in subs.items()}
+                                for p, subs in self.sub_seconds.items()},
+                "calls": {s: dict(sorted(c.items())) for s, c in self.calls.items()},
+                "calls_by_phase": {p: dict(c) for p, c in self.calls_by_phase.items()},
+                "calls_by_sub": dict(sorted(self.calls_by_sub.items())),
+                "rate_limited": dict(self.rate_limited),
+                "counters": dict(self.counters),
+            }
+
+    def write(self, path, textfile=None):
+        """
+        Write the JSON run report, and a Prometheus textfile if a path is given.
+        """
+        report = self.report()
+        try:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            if textfile:
+                with open(textfile, "w") as f:
+                    f.write(_prometheus(report))
+            print(f"[INFO] Run report written to {path} "
+                  f"({sum(sum(c.values()) for c in report['calls'].values())} API calls).")
+        except OSError as e:
+            print(f"[WARN] Could not write run report: {e}")
+
+
+def _reddit_endpoint(path):
+    path = path.split("?")[0]
+    match = _REDDIT_PATTERNS[0][0].match(path)
+    sub = match.group(1).lower() if match else None
+    for pattern, repl in _REDDIT_PATTERNS:
+        path = pattern.sub(repl, path)
+    return path, sub
+
+
+def _sheets_endpoint(url):
+    for pattern, repl in _SHEETS_PATTERNS:
+        url = pattern.sub(repl, url)
+    return url or "/", None
+
+
+def _is_429(error):
+    if type(error).__name__ == "TooManyRequests":
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+def _prometheus(report):
+    def label(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+    lines = [
+        "# TYPE xsub_run_wall_seconds gauge",
+        f"xsub_run_wall_seconds {report['wall_seconds']}",
+        "# TYPE xsub_phase_seconds gauge",
+    ]
+    for phase, v in report["phases"].items():
+        lines.append(f'xsub_phase_seconds{{phase="{label(phase)}"}} {v["seconds"]}')
+    lines.append("# TYPE xsub_sub_seconds gauge")
+    for phase, subs in report["sub_seconds"].items():
+        for sub, seconds in subs.items():
+            lines.append(f'xsub_sub_seconds{{phase="{label(phase)}",sub="{label(sub)}"}} {seconds}')
+    lines.append("# TYPE xsub_api_calls counter")
+    for service, endpoints in report["calls"].items():
+        for endpoint, n in endpoints.items():
+            lines.append(f'xsub_api_calls{{service="{service}",endpoint="{label(endpoint)}"}} {n}')
+    lines.append("# TYPE xsub_api_rate_limited counter")
+    for service, n in report["rate_limited"].items():
+        lines.append(f'xsub_api_rate_limited{{service="{service}"}} {n}')
+    lines.append("# TYPE xsub_events counter")
+    for name, n in report["counters"].items():
+        lines.append(f'xsub_events{{name="{label(name)}"}} {n}')
+    return "\n".join(lines) + "\n"
@@ -1,68 +1,100 @@
 from datetime import datetime
-import time
-from bot_config import sheet, reddit, TRUSTED_SUBS
+from bot_config import TRUSTED_SUBS
 from core_utils import is_mod  # ensure this exists
+from registry_utils import join_exemptions
 
-def check_modmail():
+def check_modmail(ctx, subs=None):
+    """
+    Handle /xsub pardon and /xsub exempt commands sent to the subs' modmail.
+
+    Conversations are listed most recently updated first, and each sub's
+    listing stops at the newest update seen last time, so only conversations
+    with new messages are read. Every handled conversation is remembered by
+    its id and last message id, so a command is never applied or answered
+    twice.
+    """
     print("[STEP] Checking for pardon and exemption messages...")
-    for sub in TRUSTED_SUBS:
+    for sub in (TRUSTED_SUBS if subs is None else subs):
         print(f"[MODMAIL] Reading modmail for r/{sub}...")
+        mark = ctx.modmail_watermarks.setdefault(sub, {"updated": "", "seen": {}})
         try:
-            sr = reddit.subreddit(sub)
+            sr = ctx.reddit.subreddit(sub)
+            newest = mark["updated"]
+            handled = 0
             for state in ("new", "mod"):
-                for convo in sr.modmail.conversations(state=state):
+                ctx.rate_budget.acquire()
+                for convo in sr.modmail.conversations(state=state, sort="recent", limit=None):
+                    updated = str(getattr(convo, 'last_updated', '') or '')
+                    if updated and updated < mark["updated"]:
+                        break
+                    newest = max(newest, updated)
                     if not convo.messages:
                         continue
                     last = convo.messages[-1]
-                    body = getattr(last, 'body_markdown', '').strip()
-                    sender = getattr(last.author, 'name', '').lower()
-                    if not sender or not body:
-                        continue
-                    if not is_mod(sr, sender):
+                    if mark["seen"].get(convo.id, [None])[0] == last.id:
                         continue
+                    handled += handle_modmail_message(ctx, sr, sub, convo, last)
+                    mark["seen"][convo.id] = [last.id, updated]
 
-                    body_l = body.lower()
-                    parts = body_l.split()
-                    if body_l.startswith('/xsub pardon') and len(parts) >= 3:
-                        user = parts[2].lstrip('u/').strip()
-                        # Verify user was banned in this sub
-                        records = sheet.get_all_records()
-                        matched = next((r for r in records if r.get('Username', '').lower() == user.lower()), None)
-                        if matched and matched.get('SourceSub', '').lower() == sub.lower():
-                            apply_override(user, sender, sub)
-                            convo.reply(body=f"✅ u/{user} has been forgiven and will not be banned.")
-                        else:
-                            print(f"[WARN] Mod u/{sender} tried to pardon u/{user}, but ban was not from r/{sub}")
-                            convo.reply(f"⚠️ Can't pardon u/{user} — they were not banned in r/{sub}.")
-
-                    elif body_l.startswith('/xsub exempt') and len(parts) >= 3:
-                        user = parts[2].lstrip('u/').strip()
-                        if apply_exemption(user, sub):
-                            convo.reply(body=f"✅ u/{user} has been exempted from bans in r/{sub}.")
+            # Only conversations updated at the watermark itself can show
+            # up again unchanged; older ids are no longer needed.
+            mark["updated"] = newest
+            mark["seen"] = {cid: seen for cid, seen in mark["seen"].items() if seen[1] >= newest}
+            print(f"[MODMAIL] {handled} new commands in r/{sub}.")
         except Exception as e:
             print(f"[WARN] Could not check modmail for r/{sub}: {e}")
-        time.sleep(2)  # Throttle to avoid hitting 429
 
-def apply_override(username, moderator, modsub):
-    records = sheet.get_all_records()
-    for i, r in enumerate(records, start=2):
-        if r.get('Username', '').lower() == username.lower():
-            sheet.update_cell(i, 5, 'yes')
-            sheet.update_cell(i, 7, moderator)
-            sheet.update_cell(i, 8, modsub)
+def handle_modmail_message(ctx, sr, sub, convo, last):
+    """
+    Apply the command in a conversation's last message, if it is one.
+    Returns 1 if a command was handled, else 0.
+    """
+    body = getattr(last, 'body_markdown', '').strip()
+    sender = getattr(last.author, 'name', '').lower()
+    if not sender or not body:
+        return 0
+    if not is_mod(sr, sender, ctx.rate_budget):
+        return 0
+
+    body_l = body.lower()
+    parts = body_l.split()
+    if body_l.startswith('/xsub pardon') and len(parts) >= 3:
+        user = parts[2].lstrip('u/').strip()
+        # Verify user was banned in this sub
+        with ctx.writer.lock:
+            matched = ctx.registry.first_row_for_user(user)
+        # SourceSub is stored as "r/<sub>" by the modlog sync
+        if matched and matched[1].source.removeprefix('r/') == sub.lower():
+            apply_override(ctx, user, sender, sub)
+            convo.reply(body=f"✅ u/{user} has been forgiven and will not be banned.")
+        else:
+            print(f"[WARN] Mod u/{sender} tried to pardon u/{user}, but ban was not from r/{sub}")
+            convo.reply(f"⚠️ Can't pardon u/{user} — they were not banned in r/{sub}.")
+        return 1
+
+    if body_l.startswith('/xsub exempt') and len(parts) >= 3:
+        user = parts[2].lstrip('u/').strip()
+        if apply_exemption(ctx, user, sub):
+            convo.reply(body=f"✅ u/{user} has been exempted from bans in r/{sub}.")
+        return 1
+    return 0
+
+def apply_override(ctx, username, moderator, modsub):
+    with ctx.writer.lock:
+        match = ctx.registry.first_row_for_user(username)
+        if match:
+            ctx.writer.update_row(match[0], ManualOverride='yes', OverriddenBy=moderator, ModSub=modsub)
             return True
     now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-    sheet.append_row([username, 'manual', '', now, 'yes', '', moderator, modsub, ''])
+    ctx.writer.append_row(Username=username, SourceSub='manual', Timestamp=now,
+                          ManualOverride='yes', OverriddenBy=moderator, ModSub=modsub)
     return True
 
-def apply_exemption(username, modsub):
-    records = sheet.get_all_records()
-    for i, r in enumerate(records, start=2):
-        if r.get('Username', '').lower() == username.lower():
-            current = str(r.get('ExemptSubs', '')).lower()
-            parts = {p.strip() for p in current.split(',') if p.strip()}
-            parts.add(modsub.lower())
-            new_field = ', '.join(sorted(parts))
-            sheet.update_cell(i, 10, new_field)
+def apply_exemption(ctx, username, modsub):
+    with ctx.writer.lock:
+        match = ctx.registry.first_row_for_user(username)
+        if match:
+            i, record = match
+            ctx.writer.update_row(i, ExemptSubs=join_exemptions(record.exemptions | {modsub.lower()}))
             return True
     return False
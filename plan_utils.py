@@ -0,0 +1,106 @@
+import contextlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from bot_config import CROSS_SUB_BAN_REASON, EXEMPT_USERS, HELD_BAN_REASON
+from core_utils import is_mod, is_forgiven, exempt_subs_for_user
+from registry_utils import utc_epoch
+
+# action is 'ban' or 'unban'; reason is the unban reason shown in the public log
+PlannedAction = namedtuple("PlannedAction", "action username sub source_sub reason")
+
+
+def desired_states(registry, now=None):
+    """
+    Decide once per run, for every recent sheet entry, what its user's ban
+    state should be. Returns a list of
+    (username, source_sub, unban_reason_or_None, exempt_subs) in sheet order.
+    Bans held for review by the daily limit are left out.
+    """
+    now = now or datetime.utcnow()
+    cutoff = utc_epoch(now - timedelta(days=1))
+    seen = set()
+    desired = []
+    # Only the rows inside the window, put back in sheet order.
+    for _, r in sorted(registry.rows_between(cutoff), key=lambda item: item[0]):
+        if not r.username or not r.source:
+            continue
+
+        key = (r.username, r.source)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        if r.forgiven_at:
+            continue
+
+        user = r.get('Username')
+        src = r.get('SourceSub')
+
+        unban_reason = "Forgiven override" if is_forgiven(user, registry) else None
+        if unban_reason is None and str(r.get('Reason')) == HELD_BAN_REASON:
+            # Over the source's daily limit: not propagated until released.
+            continue
+        desired.append((user, src, unban_reason, exempt_subs_for_user(user, registry)))
+    return desired
+
+
+def build_plan(registry, snapshots, reddit, subs, now=None, budget=None, lock=None):
+    """
+    Diff the desired ban state against every sub's ban-list snapshot and
+    return the actions needed, grouped by sub in `subs` order.
+    Subs whose ban list can't be read are left out of the plan. Ban-list
+    downloads and moderator lookups are paced by `budget` (a RateBudget);
+    the registry is read under `lock` (the sheet writer's), if given.
+    """
+    with lock or contextlib.nullcontext():
+        desired = desired_states(registry, now)
+    reason_lc = CROSS_SUB_BAN_REASON.lower()
+    plan = []
+    for sub in subs:
+        sr = reddit.subreddit(sub)
+        try:
+            bans = snapshots.bans(sr, sub, budget)
+        except Exception as e:
+            print(f"[ERROR] Cannot fetch ban list for r/{sub} ({type(e).__name__}): {e}")
+            continue
+
+        planned = set()
+        for user, src, unban_reason, exempt in desired:
+            ul = user.lower()
+            if ul in planned:
+                continue
+            pact_banned = ul in bans and reason_lc in bans[ul].lower()
+
+            if unban_reason is None and sub.lower() in exempt:
+                unban_reason = "Per-sub exemption override"
+            if unban_reason:
+                if pact_banned:
+                    plan.append(PlannedAction('unban', user, sub, src, unban_reason))
+                    planned.add(ul)
+                continue
+
+            if ul in EXEMPT_USERS or pact_banned or is_mod(sr, user, budget):
+                continue
+            plan.append(PlannedAction('ban', user, sub, src, ""))
+            planned.add(ul)
+    return plan
+
+
+def api_calls_for(plan):
+    """
+    Number of Reddit API calls executing a plan will take: one per ban or
+    unban, plus at most one ban notice DM per user and source sub.
+    """
+    notices = {(a.username.lower(), a.source_sub.lower()) for a in plan if a.action == 'ban'}
+    return len(plan) + len(notices)
+
+
+def print_plan(plan):
+    if not plan:
+        print("[PLAN] Nothing to do.")
+        return
+    for a in plan:
+        extra = f" ({a.reason})" if a.reason else ""
+        print(f"[PLAN] {a.action.upper():5} u/{a.username} in r/{a.sub} from {a.source_sub}{extra}")
+    bans = sum(1 for a in plan if a.action == 'ban')
+    print(f"[PLAN] {bans} bans, {len(plan) - bans} unbans, {api_calls_for(plan)} API calls.")
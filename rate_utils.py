@@ -0,0 +1,127 @@
+import time
+import threading
+from bot_config import RATE_LIMIT_RESERVE
+
+
+class RateBudget:
+    """
+    Shared Reddit request budget for all worker threads.
+
+    A token bucket whose level comes from Reddit's X-Ratelimit-Remaining and
+    X-Ratelimit-Reset headers (as tracked by prawcore's rate limiter). Each
+    worker takes a token before an API call. When the bucket drops to
+    RATE_LIMIT_RESERVE, workers wait for the window to reset instead of
+    sleeping a fixed amount between every call.
+    """
+
+    def __init__(self, reddit, reserve=RATE_LIMIT_RESERVE):
+        self.reddit = reddit
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        self.tokens = None      # unknown until Reddit tells us
+        self.reset_at = 0.0
+        self.seen_marker = None
+
+    def _limiter(self):
+        core = getattr(self.reddit, "_core", None)
+        return getattr(core, "_rate_limiter", None)
+
+    def _sync(self, now):
+        window = limiter_window(self._limiter(), now)
+        if window is None:
+            if self.tokens is not None and now >= self.reset_at:
+                self.tokens = None
+            return
+        remaining, reset, marker = window
+        if marker != self.seen_marker:
+            # Fresh header data: trust it over our own bookkeeping.
+            self.seen_marker = marker
+            self.tokens = remaining
+            self.reset_at = reset
+        elif now >= self.reset_at:
+            # The window those numbers belong to is over.
+            self.tokens = None
+        else:
+            self.tokens = min(self.tokens, remaining) if self.tokens is not None else remaining
+
+    def acquire(self):
+        """
+        Block until one request may be sent.
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                self._sync(now)
+                if self.tokens is None or self.tokens > self.reserve:
+                    if self.tokens is not None:
+                        self.tokens -= 1
+                    return
+                wait = self.reset_at - now
+                if wait <= 0:
+                    self.tokens = None
+                    continue
+            print(f"[RATE] Request budget low, waiting {wait:.0f}s for the rate window to reset.")
+            time.sleep(min(wait, 60))
+
+    def has_spare(self, calls=1):
+        """
+        Non-blocking check for low-priority work: True if `calls` requests
+        still leave twice the reserve for enforcement.
+        """
+        with self.lock:
+            now = time.time()
+            self._sync(now)
+            if self.tokens is None:
+                return True
+            return self.tokens - calls > 2 * self.reserve
+
+    def throttled(self, retry_after=30):
+        """
+        Called after a 429: stop every worker until the window resets.
+        """
+        with self.lock:
+            self.tokens = 0
+            self.reset_at = max(self.reset_at, time.time() + retry_after)
+
+
+def limiter_window(limiter, now):
+    """
+    Read prawcore's rate limiter: returns (remaining, reset_at, marker), or
+    None before Reddit has sent any rate-limit headers. `marker` changes
+    whenever fresh headers arrive.
+
+    prawcore < 3 keeps the reset time itself (reset_timestamp). Later
+    versions only keep remaining, used and the monotonic time the next
+    request may go out (next_request_timestamp_ns). Reddit's windows are
+    fixed window_size periods of wall-clock time, so there the reset is
+    the end of the current period; with nothing remaining, prawcore holds
+    the next request until the reset, which gives it exactly.
+    """
+    remaining = getattr(limiter, "remaining", None)
+    if remaining is None:
+        return None
+    reset = getattr(limiter, "reset_timestamp", None)
+    if reset is not None:
+        return remaining, reset, reset
+
+    next_ns = getattr(limiter, "next_request_timestamp_ns", None)
+    window = getattr(limiter, "window_size", None) or 600
+    reset = now - now % window + window
+    if remaining <= 0 and next_ns is not None:
+        reset = now + max(next_ns - time.monotonic_ns(), 0) / 1e9
+    return remaining, reset, next_ns
+
+
+def paced(listing, budget, page_size=100):
+    """
+    Iterate a praw listing, taking one token from `budget` for every page
+    it fetches.
+    """
+    if budget is None:
+        yield from listing
+        return
+    budget.acquire()
+    for i, item in enumerate(listing, start=1):
+        yield item
+        if i % page_size == 0:
+            budget.acquire()
@@ -0,0 +1,324 @@
+import sys
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+
+# Default sheet layout, used when a field is not found in the sheet's header.
+SHEET_COLUMNS = [
+    'Username',
+    'SourceSub',
+    'Reason',
+    'Timestamp',
+    'ManualOverride',
+    'ModLogID',
+    'OverriddenBy',
+    'ModSub',
+    'ForgiveTimestamp',
+    'ExemptSubs',
+]
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+NO_EXEMPTIONS = frozenset()
+
+
+def parse_timestamp(value):
+    """
+    Turn a sheet timestamp (UTC) into epoch seconds, or None if it isn't one.
+    """
+    s = str(value)
+    # Slicing the fixed layout is several times faster than strptime; anything
+    # else (hand-typed rows without zero padding, stray spaces) goes the slow way.
+    if len(s) == 19 and s[4] == '-' and s[7] == '-' and s[10] == ' ' and s[13] == ':' and s[16] == ':':
+        try:
+            return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]), int(s[14:16]),
+                            int(s[17:19]), tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(s.strip(), TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+def utc_epoch(dt):
+    """
+    Epoch seconds of a naive UTC datetime (as returned by utcnow()).
+    """
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def column_map(header):
+    """
+    Return {field: position} for the sheet's header, with any default
+    column the sheet lacks added at the end so its value is still kept.
+    """
+    fields = list(header) + [c for c in SHEET_COLUMNS if c not in header]
+    return {field: i for i, field in enumerate(fields)}
+
+
+class BanRecord:
+    """
+    One ban sheet row, parsed once when it is loaded.
+
+    The cell values are kept as a tuple in column-map order; the fields the
+    bot decides on are parsed into slots: lowercased username and source
+    sub, epoch timestamp (None if unparseable), the ManualOverride flag,
+    the ForgiveTimestamp text and the exempt subs. get() reads any cell by
+    field name, like the dict rows it replaces.
+    """
+
+    __slots__ = ('columns', 'values', 'username', 'source', 'timestamp',
+                 'forgiven', 'forgiven_at', 'exemptions')
+
+    def __init__(self, row, columns):
+        self.columns = columns
+        self.values = tuple(row.get(field, '') for field in columns)
+        self.username = _norm(self.get('Username'))
+        # Only a handful of distinct source subs: share one string each.
+        self.source = sys.intern(_norm(self.get('SourceSub')))
+        self.timestamp = parse_timestamp(self.get('Timestamp'))
+        self.forgiven = str(self.get('ManualOverride')).lower() in ('yes', 'true')
+        self.forgiven_at = str(self.get('ForgiveTimestamp') or '').strip()
+        self.exemptions = split_exemptions(self.get('ExemptSubs'))
+
+    def get(self, field, default=''):
+        i = self.columns.get(field)
+        return default if i is None else self.values[i]
+
+    def as_dict(self):
+        return {field: self.values[i] for field, i in self.columns.items()}
+
+
+def split_exemptions(field):
+    """
+    Parse an ExemptSubs cell ("a, b") into a frozenset of lowercased subs.
+    """
+    field = str(field or '').lower()
+    if not field.strip():
+        return NO_EXEMPTIONS
+    return frozenset(sub.strip() for sub in field.split(',') if sub.strip())
+
+
+def join_exemptions(subs):
+    return ', '.join(sorted(subs))
+
+
+class BanRegistry:
+    """
+    In-memory view of the ban sheet with lookup indexes.
+
+    Rows are kept in sheet order (row number = index + 2, because row 1 is
+    the header) as BanRecords sharing one column map. Every lookup the bot
+    does per user is served from a dict or set instead of scanning the
+    whole sheet, and rows are also indexed by timestamp (overall and per
+    source sub) so time-window queries only touch the rows in the window.
+
+    `archived` holds the usernames whose rows were moved to the archive;
+    has_user() still knows them, so they are not logged a second time.
+    """
+
+    def __init__(self, rows=None):
+        self.header = []
+        self.columns = column_map([])
+        self.loaded_at = None
+        self.archived = set()
+        self.load(rows or [])
+
+    def load(self, rows, header=None):
+        """
+        Replace all rows. The new rows and indexes are built on the side
+        and swapped in with one dict update, so a thread reading without
+        the writer lock sees either the old registry or the new one, never
+        a half-built mix.
+        """
+        fresh = BanRegistry.__new__(BanRegistry)
+        fresh.header = self.header if header is None else list(header)
+        fresh.columns = column_map(fresh.header)
+        rows = [r.as_dict() if isinstance(r, BanRecord) else r for r in rows]
+        fresh.rows = []
+        fresh.by_user = {}          # username -> [row_num, ...] in sheet order
+        fresh.by_user_source = {}   # (username, source) -> first row_num
+        fresh.forgiven = set()      # usernames with ManualOverride yes/true
+        fresh.exemptions = {}       # username -> exempt subs of first row that has any
+        fresh.by_time = []          # (timestamp, row_num), sorted
+        fresh.by_source_time = {}   # source -> [(timestamp, row_num)], sorted
+        # Sorting once at the end beats inserting in order row by row.
+        fresh._bulk = True
+        for row in rows:
+            fresh.append(row)
+        fresh.by_time.sort()
+        for entries in fresh.by_source_time.values():
+            entries.sort()
+        fresh._bulk = False
+        self.__dict__.update(fresh.__dict__)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def row(self, row_num):
+        return self.rows[row_num - 2]
+
+    def column(self, field):
+        """
+        Return the 1-based sheet column for a field name.
+        """
+        if field in self.header:
+            return self.columns[field] + 1
+        return SHEET_COLUMNS.index(field) + 1
+
+    def row_values(self, row_num):
+        """
+        Return a row as the list of cell strings the sheet would show,
+        in header order and without trailing blanks. Row 1 is the header.
+        """
+        if row_num == 1:
+            values = list(self.header)
+        else:
+            cells = self.row(row_num).values
+            values = ['' if v is None else str(v) for v in cells[:len(self.header)]]
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+    def append(self, row):
+        """
+        Add a row (a dict of field values) as if it had been appended to
+        the bottom of the sheet. Returns its sheet row number.
+        """
+        record = BanRecord(row, self.columns)
+        self.rows.append(record)
+        row_num = len(self.rows) + 1
+        self._index(row_num, record)
+        self._index_time(row_num, record)
+        return row_num
+
+    def update(self, row_num, **fields):
+        """
+        Change fields on an existing row and refresh the indexes it touches.
+        """
+        old = self.row(row_num)
+        row = old.as_dict()
+        row.update(fields)
+        record = BanRecord(row, self.columns)
+        if record.username != old.username:
+            # Username edits are rare enough that a rebuild is fine.
+            rows = list(self.rows)
+            rows[row_num - 2] = record
+            self.load(rows)
+            return
+        self.rows[row_num - 2] = record
+        self._index(row_num, record, new=False)
+        if (record.timestamp, record.source) != (old.timestamp, old.source):
+            self._unindex_time(row_num, old)
+            self._index_time(row_num, record)
+
+    def _index(self, row_num, record, new=True):
+        user = record.username
+        if not user:
+            return
+        if new:
+            self.by_user.setdefault(user, []).append(row_num)
+            self.by_user_source.setdefault((user, record.source), row_num)
+        if record.forgiven:
+            self.forgiven.add(user)
+        elif not new and user in self.forgiven:
+            if not any(self.row(n).forgiven for n in self.by_user[user]):
+                self.forgiven.discard(user)
+        self._index_exemptions(user)
+
+    def _index_time(self, row_num, record):
+        if record.timestamp is None:
+            return
+        key = (record.timestamp, row_num)
+        for entries in (self.by_time, self.by_source_time.setdefault(record.source, [])):
+            if self._bulk or not entries or key > entries[-1]:
+                entries.append(key)
+            else:
+                insort(entries, key)
+
+    def _unindex_time(self, row_num, record):
+        if record.timestamp is None:
+            return
+        key = (record.timestamp, row_num)
+        for entries in (self.by_time, self.by_source_time.get(record.source, [])):
+            i = bisect_left(entries, key)
+            if i < len(entries) and entries[i] == key:
+                del entries[i]
+
+    def _index_exemptions(self, user):
+        for n in self.by_user.get(user, ()):
+            exemptions = self.row(n).exemptions
+            if exemptions:
+                self.exemptions[user] = exemptions
+                return
+        self.exemptions.pop(user, None)
+
+    # --- Lookups ---
+
+    def _window(self, source):
+        return self.by_time if source is None else self.by_source_time.get(_norm(source), [])
+
+    def rows_between(self, start=None, end=None, source=None):
+        """
+        Return [(row_num, record)] with start <= timestamp < end (epoch
+        seconds; None leaves that side open), oldest first, optionally only
+        rows from one source sub ("r/<sub>"). Rows without a valid
+        timestamp are never returned.
+        """
+        entries = self._window(source)
+        lo = 0 if start is None else bisect_left(entries, (start,))
+        hi = len(entries) if end is None else bisect_left(entries, (end,))
+        return [(n, self.row(n)) for _, n in entries[lo:hi]]
+
+    def count_between(self, start, end=None, source=None):
+        """
+        Number of rows rows_between() would return, in O(log n).
+        """
+        entries = self._window(source)
+        hi = len(entries) if end is None else bisect_left(entries, (end,))
+        return hi - bisect_left(entries, (start,))
+
+    def has_user(self, user):
+        user = _norm(user)
+        return user in self.by_user or user in self.archived
+
+    def rows_for_user(self, user):
+        return [(n, self.row(n)) for n in self.by_user.get(_norm(user), ())]
+
+    def first_row_for_user(self, user):
+        """
+        Return (row_num, record) for the first sheet row of a user, or None.
+        """
+        nums = self.by_user.get(_norm(user))
+        if not nums:
+            return None
+        return nums[0], self.row(nums[0])
+
+    def first_unforgiven_row(self, user):
+        """
+        Return (row_num, record) for the first row of a user that has no
+        ForgiveTimestamp yet, or None.
+        """
+        for n in self.by_user.get(_norm(user), ()):
+            record = self.row(n)
+            if not record.forgiven_at:
+                return n, record
+        return None
+
+    def row_for_user_source(self, user, source):
+        n = self.by_user_source.get((_norm(user), _norm(source)))
+        return None if n is None else (n, self.row(n))
+
+    def is_forgiven(self, user):
+        return _norm(user) in self.forgiven
+
+    def exempt_subs(self, user):
+        return self.exemptions.get(_norm(user), NO_EXEMPTIONS)
+
+
+def _norm(value):
+    value = str(value or '').strip()
+    lowered = value.lower()
+    # Keep the original string when it already is lowercase, rather than a copy.
+    return value if lowered == value else lowered
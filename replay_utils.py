@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import time
+import shutil
+import threading
+from urllib.parse import unquote
+from bot_config import STATE_DIR, TRUSTED_SUBS, config
+from metrics_utils import wrap_reddit_requests
+
+# Positional argument names of the request methods we wrap:
+# prawcore Session.request and gspread's HTTPClient/Client.request.
+REQUEST_ARGS = {
+    "reddit": ("data", "files", "json", "params", "timeout"),
+    "sheets": ("params", "data", "json", "files", "headers"),
+}
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def request_fields(service, args, kwargs):
+    """
+    Return the request's params and body as plain JSON-able data.
+    """
+    named = dict(zip(REQUEST_ARGS[service], args))
+    named.update(kwargs)
+    return {k: _plain(named.get(k)) for k in ("params", "data", "json") if named.get(k) is not None}
+
+
+def request_key(service, method, path, fields):
+    """
+    Canonical string identifying a request, used to match a replayed
+    request with its recording.
+    """
+    return json.dumps([service, str(method).upper(), str(path), fields], sort_keys=True, default=str)
+
+
+def action_keys(service, method, path, fields):
+    """
+    Split a mutating request into the actions it performs, as canonical
+    strings that don't depend on how writes were batched or ordered: one
+    per ban, unban, message or modmail reply (by user and sub or thread),
+    one per sheet row appended (by its values) and one per sheet range
+    written. Requests of any other kind are kept whole.
+    """
+    path = unquote(str(path))
+    body = fields.get("json") or _form(fields.get("data"))
+    keys = []
+    if service == "reddit":
+        m = re.search(r"r/([^/]+)/api/(friend|unfriend)/?$", path)
+        if m and body.get("type") == "banned":
+            action = "ban" if m.group(2) == "friend" else "unban"
+            keys.append([action, m.group(1).lower(), str(body.get("name", "")).lower()])
+        elif path.rstrip("/").endswith("api/compose"):
+            keys.append(["message", str(body.get("to", "")).lower(), body.get("subject")])
+        elif re.search(r"api/mod/conversations/[^/]+$", path) and "body" in body:
+            keys.append(["modmail_reply", path.rsplit("/", 1)[1], body.get("body")])
+    else:
+        m = re.search(r"/values/([^/]+):append$", path)
+        if m:
+            title = m.group(1).split("!")[0].strip("'")
+            keys.extend(["sheet_append", title, row] for row in body.get("values") or [])
+        elif path.endswith("/values:batchUpdate"):
+            keys.extend(["sheet_write", d.get("range"), d.get("values")] for d in body.get("data") or [])
+        elif re.search(r"/values/[^/]+:clear$", path):
+            keys.append(["sheet_clear", path.rsplit("/", 1)[1][:-len(":clear")]])
+        elif re.search(r"/values/[^/:]+$", path):
+            keys.append(["sheet_write", path.rsplit("/", 1)[1], body.get("values")])
+        elif path.endswith(":batchUpdate"):
+            keys.extend(["sheet_batch", r] for r in body.get("requests") or [])
+    if not keys:
+        return [request_key(service, method, path, fields)]
+    return [json.dumps(k, sort_keys=True, default=str) for k in keys]
+
+
+def _form(data):
+    if isinstance(data, dict):
+        return data
+    if isinstance(data, list):
+        return {str(pair[0]): pair[1] for pair in data if isinstance(pair, list) and len(pair) == 2}
+    return {}
+
+
+def _plain(value):
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class Recorder:
+    """
+    Records every Reddit and Sheets response of a run (--record DIR) so the
+    run can be replayed offline with benchmarks/replay.py.
+
+    The fixture directory gets a copy of .bot_state as it was before the
+    run, meta.json (start time, trusted subs, config, command line) and
+    requests.jsonl with one line per request: what was asked, how long it
+    took and what came back (or which error was raised).
+
+    Fixtures contain real usernames and modmail text; keep them private.
+    """
+
+    def __init__(self, path, argv=()):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        state_copy = os.path.join(path, "state")
+        shutil.rmtree(state_copy, ignore_errors=True)
+        if os.path.isdir(STATE_DIR):
+            shutil.copytree(STATE_DIR, state_copy)
+        self.meta = {
+            "started_at": time.time(),
+            "trusted_subs": list(TRUSTED_SUBS),
+            "config": config,
+            "argv": [a for i, a in enumerate(argv)
+                     if a != "--record" and (i == 0 or argv[i - 1] != "--record")],
+            "sheet_key": None,
+        }
+        self.count = 0
+        self._out = open(os.path.join(path, "requests.jsonl"), "w")
+        print(f"[INFO] Recording API traffic to {path}")
+
+    def attach_reddit(self, reddit):
+        wrap_reddit_requests(reddit, lambda request: self._wrap(request, "reddit"))
+
+    def attach_sheets(self, client, sheet_key):
+        target = getattr(client, "http_client", client)
+        target.request = self._wrap(target.request, "sheets")
+        self.meta["sheet_key"] = sheet_key
+        # The sheet was opened before we were attached; open it once more
+        # so the replay has the spreadsheet metadata it needs.
+        client.open_by_key(sheet_key).sheet1
+
+    def _wrap(self, request, service):
+        def recorded(method, path, *args, **kwargs):
+            entry = {
+                "service": service,
+                "method": str(method).upper(),
+                "path": str(path),
+                "fields": request_fields(service, args, kwargs),
+                "at": time.time(),
+            }
+            start = time.time()
+            try:
+                result = request(method, path, *args, **kwargs)
+            except Exception as e:
+                entry["elapsed"] = time.time() - start
+                response = getattr(e, "response", None)
+                entry["error"] = {
+                    "type": type(e).__name__,
+                    "status": getattr(response, "status_code", None),
+                    "headers": dict(getattr(response, "headers", None) or {}),
+                    "text": getattr(response, "text", None) or str(e),
+                }
+                self._write(entry)
+                raise
+            entry["elapsed"] = time.time() - start
+            entry["response"] = _response_data(service, result)
+            self._write(entry)
+            return result
+        return recorded
+
+    def _write(self, entry):
+        line = json.dumps(entry, default=str)
+        with self.lock:
+            self._out.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            if self._out.closed:
+                return
+            self._out.close()
+        self.meta["finished_at"] = time.time()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2, default=str)
+        print(f"[INFO] Recorded {self.count} API requests to {self.path}")
+
+
+def _response_data(service, result):
+    if service == "reddit":
+        # prawcore already returns the decoded JSON
+        return {"json": result}
+    try:
+        body = result.json()
+    except ValueError:
+        return {"status": result.status_code, "text": result.text}
+    return {"status": result.status_code, "json": body}
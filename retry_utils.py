@@ -0,0 +1,84 @@
+import time
+import random
+import threading
+from bot_config import RETRY_MAX_ATTEMPTS, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS
+from state_utils import load_state, save_state
+
+
+class RetryQueue:
+    """
+    Durable queue of bans and unbans that failed on a rate limit or
+    transient error. Ban notices have their own queue (dm_utils.DMQueue).
+
+    Each entry remembers how often it was tried and when it may be tried
+    next (exponential backoff with jitter). Entries are dropped after
+    RETRY_MAX_ATTEMPTS. The queue is saved in .bot_state/ so a failure in
+    one run is retried by the next.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = load_state("retry_queue", [])
+
+    def save(self):
+        with self.lock:
+            save_state("retry_queue", self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _find(self, kind, username, sub):
+        for entry in self.entries:
+            if (entry["kind"], entry["username"].lower(), entry["sub"]) == (kind, username.lower(), sub):
+                return entry
+        return None
+
+    def add(self, kind, username, sub, source_sub="", reason="", error=""):
+        """
+        Queue a failed action, or count another failure if it is queued already.
+        """
+        with self.lock:
+            entry = self._find(kind, username, sub)
+            if entry is None:
+                entry = {
+                    "kind": kind,
+                    "username": username,
+                    "sub": sub,
+                    "source_sub": source_sub,
+                    "reason": reason,
+                    "attempts": 0,
+                }
+                self.entries.append(entry)
+            self._backoff(entry, error)
+
+    def _backoff(self, entry, error):
+        entry["attempts"] += 1
+        entry["last_error"] = str(error)
+        if entry["attempts"] >= RETRY_MAX_ATTEMPTS:
+            print(f"[ERROR] Giving up on {entry['kind']} of u/{entry['username']} in r/{entry['sub']} "
+                  f"after {entry['attempts']} attempts: {error}")
+            self.entries.remove(entry)
+            return
+        delay = min(RETRY_BASE_SECONDS * 2 ** (entry["attempts"] - 1), RETRY_MAX_SECONDS)
+        entry["next_attempt"] = time.time() + delay * random.uniform(0.5, 1.5)
+        print(f"[RETRY] {entry['kind']} of u/{entry['username']} in r/{entry['sub']} "
+              f"queued, attempt {entry['attempts']}, retry in ~{delay:.0f}s.")
+
+    def take_due(self):
+        """
+        Remove and return every entry whose next attempt time has come.
+        Failures should be passed back through add().
+        """
+        now = time.time()
+        with self.lock:
+            due = [e for e in self.entries if e.get("next_attempt", 0) <= now]
+            self.entries = [e for e in self.entries if e.get("next_attempt", 0) > now]
+        return due
+
+    def restore(self, entry, error):
+        """
+        Put a due entry that failed again back in the queue.
+        """
+        with self.lock:
+            self.entries.append(entry)
+            self._backoff(entry, error)
@@ -0,0 +1,195 @@
+import time
+from bot_config import setup_google_sheet, setup_reddit
+from registry_utils import BanRegistry
+from sheet_utils import SheetWriteBuffer, SheetSyncWorker
+from store_utils import BanStore
+from snapshot_utils import BanSnapshots
+from rate_utils import RateBudget
+from retry_utils import RetryQueue
+from dm_utils import DMQueue
+from stats_utils import StatsAggregator
+from metrics_utils import RunMetrics
+from state_utils import load_state
+
+
+class RunContext:
+    """
+    Everything one bot run works with: API clients, the ban registry and the
+    caches kept between runs.
+
+    Nothing is built until a phase first asks for it, so importing modules
+    or running a command that only needs Reddit never touches Google (and
+    the other way round). One context is created per process and passed to
+    every phase.
+    """
+
+    def __init__(self):
+        self._reddit = None
+        self._sheets = None
+        self._store = None
+        self._writer = None
+        self._sheet_sync = None
+        self._snapshots = None
+        self._rate_budget = None
+        self._retry_queue = None
+        self._dm_queue = None
+        self._stats = None
+        self._stats_sheet = None
+        self._modlog_watermarks = None
+        self._modmail_watermarks = None
+        self.registry = BanRegistry()
+        self.metrics = RunMetrics()
+        self.recorder = None   # replay_utils.Recorder when run with --record
+        self.started_at = time.time()
+
+    # --- API clients ---
+
+    @property
+    def reddit(self):
+        if self._reddit is None:
+            self._reddit = setup_reddit()
+            self.metrics.instrument_reddit(self._reddit)
+            if self.recorder is not None:
+                self.recorder.attach_reddit(self._reddit)
+        return self._reddit
+
+    def _google(self):
+        if self._sheets is None:
+            self._sheets = setup_google_sheet()
+            self.metrics.instrument_sheets(self._sheets[1])
+            if self.recorder is not None:
+                self.recorder.attach_sheets(self._sheets[1], self._sheets[2])
+        return self._sheets
+
+    @property
+    def sheet(self):
+        return self._google()[0]
+
+    @property
+    def client(self):
+        return self._google()[1]
+
+    @property
+    def sheet_key(self):
+        return self._google()[2]
+
+    @property
+    def stats_sheet(self):
+        # Opened from the ban sheet's spreadsheet, not with a new open_by_key.
+        if self._stats_sheet is None:
+            self._stats_sheet = self.sheet.spreadsheet.worksheet("Stats")
+        return self._stats_sheet
+
+    @stats_sheet.setter
+    def stats_sheet(self, worksheet):
+        self._stats_sheet = worksheet
+
+    # --- Caches and queues ---
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = BanStore()
+        return self._store
+
+    @property
+    def writer(self):
+        # The sheet is only opened when the first push actually happens.
+        if self._writer is None:
+            self._writer = SheetWriteBuffer(lambda: self.sheet, self.registry, self.store)
+        return self._writer
+
+    @property
+    def sheet_sync(self):
+        if self._sheet_sync is None:
+            self._sheet_sync = SheetSyncWorker(
+                lambda: self.sheet, self.registry, self.store, self.writer, metrics=self.metrics
+            )
+        return self._sheet_sync
+
+    def start_sheet_sync(self):
+        """
+        Start mirroring the store to the sheet (and back) in the background.
+        """
+        if not self.sheet_sync.is_alive():
+            self.sheet_sync.start()
+
+    @property
+    def snapshots(self):
+        if self._snapshots is None:
+            self._snapshots = BanSnapshots()
+        return self._snapshots
+
+    @property
+    def rate_budget(self):
+        if self._rate_budget is None:
+            self._rate_budget = RateBudget(self.reddit)
+        return self._rate_budget
+
+    @property
+    def retry_queue(self):
+        if self._retry_queue is None:
+            self._retry_queue = RetryQueue()
+        return self._retry_queue
+
+    @property
+    def dm_queue(self):
+        if self._dm_queue is None:
+            self._dm_queue = DMQueue()
+        return self._dm_queue
+
+    @property
+    def stats(self):
+        if self._stats is None:
+            self._stats = StatsAggregator()
+        return self._stats
+
+    @property
+    def modlog_watermarks(self):
+        # sub -> {"id", "created_utc"} of the newest modlog entry processed
+        if self._modlog_watermarks is None:
+            self._modlog_watermarks = load_state("modlog_watermarks", {})
+        return self._modlog_watermarks
+
+    @property
+    def modmail_watermarks(self):
+        # sub -> {"updated": newest last_updated handled,
+        #         "seen": {conversation id: [last message id, last_updated]}}
+        if self._modmail_watermarks is None:
+            self._modmail_watermarks = load_state("modmail_watermarks", {})
+        return self._modmail_watermarks
+
+    def prepare_workers(self):
+        """
+        Build the shared objects per-sub workers use, from the calling
+        thread. Two workers racing to create the same one would each get
+        their own copy, and the updates made to the losing copy would be lost.
+        """
+        for name in ("reddit", "rate_budget", "store", "writer", "snapshots",
+                     "retry_queue", "dm_queue", "modlog_watermarks", "modmail_watermarks"):
+            getattr(self, name)
+
+    def flush_writes(self):
+        """
+        Ask for pending sheet writes to be pushed: by the background worker
+        if it is running, otherwise right now.
+        """
+        if self._sheet_sync is not None and self._sheet_sync.is_alive():
+            self._sheet_sync.nudge()
+        elif self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        """
+        Stop the sheet sync worker after a final push and close the store.
+        Safe to call more than once.
+        """
+        if self._store is None:
+            return   # never opened, or already closed
+        if self._sheet_sync is not None:
+            self._sheet_sync.stop()
+        elif self._writer is not None:
+            self._writer.flush()
+        if self._store is not None:
+            self._store.close()
+            self._store = None
@@ -0,0 +1,367 @@
+import time
+import threading
+import contextlib
+from gspread.utils import rowcol_to_a1
+
+from bot_config import SHEET_FULL_RELOAD_MINUTES, MAX_PENDING_SHEET_WRITES, SHEET_SYNC_SECONDS
+from registry_utils import SHEET_COLUMNS
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+
+
+def load_registry(store, registry):
+    """
+    Fill the registry from the local store without touching Google.
+    Returns False if the store has never been filled from the sheet.
+    """
+    header = store.header
+    if not header:
+        return False
+    registry.load(store.load_rows(), header=header)
+    registry.archived = store.archived_usernames()
+    registry.loaded_at = store.get_meta("last_full_pull")
+    print(f"[INFO] Loaded {len(registry)} rows from the local ban store.")
+    return True
+
+
+def _fetch_all(sheet):
+    start = time.time()
+    rows = sheet.get_all_records()
+    header = list(rows[0].keys()) if rows else sheet.row_values(1)
+    print(f"[DEBUG] Sheet load took {time.time() - start:.2f}s")
+    return rows, header
+
+
+def full_load(sheet, registry, store):
+    """
+    Download the whole ban sheet and make it the content of both the
+    registry and the local store.
+    """
+    modified = modified_time(sheet)
+    rows, header = _fetch_all(sheet)
+    registry.load(rows, header=header)
+    store.replace_all(rows, header)
+    store.set_meta("sheet_modified", modified)
+    registry.archived = store.archived_usernames()
+    registry.loaded_at = time.time()
+    store.set_meta("last_full_pull", registry.loaded_at)
+    print(f"[INFO] Loaded {len(registry)} rows into local cache.")
+
+
+def refresh(sheet, registry, store, lock):
+    """
+    Import changes other writers (mods editing by hand, another bot) made
+    in the sheet. Local rows not yet pushed always win.
+
+    The spreadsheet's Drive modifiedTime moves on every edit by anyone, so
+    it is checked first (one small metadata request). If it is what we
+    saw at our last read, nothing is read. If it moved, or can't be read,
+    the last known row and everything below it are read: new rows are
+    appended, and if that accounts for nothing (or the last row itself
+    changed) the edit was elsewhere and the whole sheet is compared row
+    by row. The bot's own writes go through own_writes(), which keeps them
+    from counting as a change.
+
+    Every SHEET_FULL_RELOAD_MINUTES the whole sheet is compared anyway.
+    That catches what the checks above can miss: an edit to an earlier row
+    made together with an append, or made while our own write was in
+    flight.
+    """
+    known = store.sheet_rows
+    if len(registry) > known:
+        # Our own appends are still on their way; row numbers aren't settled.
+        return
+    modified = modified_time(sheet)
+    if registry.loaded_at is None or not registry.header:
+        return _reconcile(sheet, registry, store, lock, modified)
+    if time.time() - registry.loaded_at > SHEET_FULL_RELOAD_MINUTES * 60:
+        print("[INFO] Sheet cache is stale, comparing the full sheet.")
+        return _reconcile(sheet, registry, store, lock, modified)
+    if modified is not None and modified == store.get_meta("sheet_modified"):
+        return
+
+    anchor = known + 1
+    last_col = rowcol_to_a1(1, len(registry.header)).rstrip('0123456789')
+    values = sheet.get(f"A{anchor}:{last_col}")
+
+    with lock:
+        if len(registry) != known:
+            return
+        if not values or _trim(values[0]) != registry.row_values(anchor):
+            print(f"[INFO] Sheet row {anchor} changed since last load, comparing the full sheet.")
+            changed = True
+        else:
+            for raw in values[1:]:
+                padded = list(raw) + [''] * (len(registry.header) - len(raw))
+                row = dict(zip(registry.header, padded))
+                store.put(registry.append(row), row)
+            store.set_sheet_rows(len(registry))
+            if len(values) > 1:
+                print(f"[INFO] Picked up {len(values) - 1} new sheet rows.")
+            # New rows explain the edit; without any it was somewhere above.
+            changed = modified is not None and len(values) == 1
+            if changed:
+                print("[INFO] Sheet was edited since the last read, comparing the full sheet.")
+            elif modified is not None:
+                store.set_meta("sheet_modified", modified)
+    if changed:
+        _reconcile(sheet, registry, store, lock, modified)
+
+
+def _reconcile(sheet, registry, store, lock, modified=None):
+    """
+    Compare the full sheet with the registry and import what differs.
+    `modified` is the sheet's modifiedTime read before the download; it is
+    remembered once the sheet's content has been taken in.
+    """
+    rows, header = _fetch_all(sheet)
+    with lock:
+        if list(header) != registry.header or len(rows) < len(registry):
+            # Columns changed or rows were removed: row numbers can't be
+            # trusted any more, so start over from the sheet, unless that
+            # would throw away local changes.
+            if store.dirty_rows():
+                print("[WARN] Sheet layout changed but local changes are unpushed; will retry.")
+                return
+            print("[INFO] Sheet rows were removed or reordered, reloading from the sheet.")
+            registry.load(rows, header=header)
+            store.replace_all(rows, header)
+        else:
+            updated = added = 0
+            for row_num, row in enumerate(rows, start=2):
+                if row_num > len(registry) + 1:
+                    store.put(registry.append(row), row)
+                    added += 1
+                elif _differs(registry.row(row_num), row, header) and not store.is_dirty(row_num):
+                    registry.update(row_num, **row)
+                    store.put(row_num, registry.row(row_num).as_dict())
+                    updated += 1
+            store.set_sheet_rows(len(rows))
+            if updated or added:
+                print(f"[INFO] Imported {updated} edited and {added} new sheet rows.")
+        registry.loaded_at = time.time()
+        store.set_meta("last_full_pull", registry.loaded_at)
+        if modified is not None:
+            store.set_meta("sheet_modified", modified)
+
+
+def modified_time(sheet):
+    """
+    Return the spreadsheet's Drive modifiedTime, or None if it can't be read.
+    """
+    spreadsheet = sheet.spreadsheet
+    try:
+        resp = spreadsheet.client.request(
+            "get", f"{DRIVE_FILES_URL}/{spreadsheet.id}",
+            params={"fields": "modifiedTime", "supportsAllDrives": True},
+        )
+        return resp.json().get("modifiedTime")
+    except Exception as e:
+        print(f"[WARN] Could not read the sheet's modification time: {e}")
+        return None
+
+
+@contextlib.contextmanager
+def own_writes(sheet, store):
+    """
+    Wrap the bot's own writes to the spreadsheet (any worksheet), so the
+    modifiedTime they cause isn't taken for someone else's edit. If the
+    sheet had already changed before we wrote, nothing is taken as ours
+    and the next refresh compares the full sheet as it should. An edit
+    landing between our write and the second read is taken as ours; the
+    periodic full compare in refresh() picks it up.
+    """
+    before = modified_time(sheet)
+    yield
+    if before is not None and before == store.get_meta("sheet_modified"):
+        store.set_meta("sheet_modified", modified_time(sheet))
+
+
+def _differs(current, fresh, header):
+    return any(str(current.get(h, '')) != str(fresh.get(h, '')) for h in header)
+
+
+def _trim(values):
+    values = [str(v) for v in values]
+    while values and values[-1] == '':
+        values.pop()
+    return values
+
+
+class SheetWriteBuffer:
+    """
+    Records ban-sheet changes locally and pushes them to Google in batches.
+
+    Every change goes to the registry and the SQLite store right away, with
+    the changed fields marked dirty, so nothing waits on Sheets and nothing
+    is lost if the run dies. flush() sends all dirty rows in at most two
+    calls: one append_rows for new rows, one batch_update for edited cells
+    (adjacent cells of a row merged into one range). The sheet sync worker
+    calls flush() in the background; queuing MAX_PENDING_SHEET_WRITES
+    changes wakes it early.
+    """
+
+    def __init__(self, get_sheet, registry, store, max_pending=MAX_PENDING_SHEET_WRITES):
+        self.get_sheet = get_sheet
+        self.registry = registry
+        self.store = store
+        self.max_pending = max_pending
+        self.pending = 0
+        self.lock = threading.RLock()       # guards registry + store edits
+        self.push_lock = threading.Lock()   # one push at a time
+        self.wake = threading.Event()
+
+    def __len__(self):
+        return self.pending
+
+    def update_row(self, row_num, **fields):
+        with self.lock:
+            self.registry.update(row_num, **fields)
+            self.store.put(row_num, self.registry.row(row_num).as_dict(), dirty_fields=list(fields))
+            self._queued()
+
+    def append_row(self, **fields):
+        """
+        Add a new row; fields not given are left blank.
+        Returns the row number it is expected to land on.
+        """
+        with self.lock:
+            row = {field: fields.get(field, '') for field in self.registry.columns}
+            row_num = self.registry.append(row)
+            self.store.put(row_num, row, dirty_fields=list(row))
+            self._queued()
+            return row_num
+
+    def _queued(self):
+        self.pending += 1
+        if self.pending >= self.max_pending:
+            self.wake.set()
+
+    def flush(self):
+        with self.push_lock:
+            dirty = self.store.dirty_rows()
+            if not dirty:
+                return
+            self.pending = 0
+            known = self.store.sheet_rows
+            appends = [d for d in dirty if d[0] > known + 1]   # row 1 is the header
+            updates = [d for d in dirty if d[0] <= known + 1]
+            try:
+                sheet = self.get_sheet()
+                with own_writes(sheet, self.store):
+                    if appends:
+                        self._push_appends(sheet, known, appends)
+                    if updates:
+                        self._push_updates(sheet, updates)
+            except Exception as e:
+                print(f"[ERROR] Failed to push sheet writes, will retry: {e}")
+
+    def _push_appends(self, sheet, known, appends):
+        header = self.registry.header or SHEET_COLUMNS
+        expected = known + 2
+        resp = sheet.append_rows(
+            [[row.get(h, '') for h in header] for _, row, _, _ in appends],
+            value_input_option='USER_ENTERED',
+        )
+        self.store.mark_clean([(n, v) for n, _, _, v in appends])
+        self.store.set_sheet_rows(known + len(appends))
+        print(f"[INFO] Appended {len(appends)} rows to sheet in one call.")
+
+        # If someone else appended meanwhile, our rows landed further down.
+        actual = _first_row_of_range(
+            (resp or {}).get('updates', {}).get('updatedRange', '')
+        )
+        if actual and actual != expected:
+            print(f"[WARN] Appended rows landed {actual - expected} rows lower than expected.")
+            # Row numbers no longer match the sheet; the next sync compares
+            # the full sheet and realigns them.
+            self.registry.loaded_at = None
+
+    def _push_updates(self, sheet, updates):
+        data = []
+        for row_num, row, fields, _ in updates:
+            cells = {self.registry.column(f): row.get(f, '') for f in fields}
+            for start, values in contiguous_runs(cells):
+                end = start + len(values) - 1
+                data.append({
+                    'range': f"{rowcol_to_a1(row_num, start)}:{rowcol_to_a1(row_num, end)}",
+                    'values': [values],
+                })
+        sheet.batch_update(data, value_input_option='USER_ENTERED')
+        self.store.mark_clean([(n, v) for n, _, _, v in updates])
+        print(f"[INFO] Wrote {len(updates)} updated rows to sheet in one call.")
+
+
+class SheetSyncWorker(threading.Thread):
+    """
+    Background thread that keeps the Google Sheet and the local store in
+    step: pushes local changes, then imports changes made in the sheet.
+    Runs every SHEET_SYNC_SECONDS, or sooner when the write buffer fills up.
+    """
+
+    def __init__(self, get_sheet, registry, store, writer, interval=SHEET_SYNC_SECONDS, metrics=None):
+        super().__init__(name="sheet-sync", daemon=True)
+        self.get_sheet = get_sheet
+        self.registry = registry
+        self.store = store
+        self.writer = writer
+        self.interval = interval
+        self.metrics = metrics
+        self.busy = threading.Lock()   # held while syncing; archiving waits on it
+        self._stop_event = threading.Event()
+
+    def sync_once(self):
+        if self.metrics is None:
+            return self._sync()
+        with self.metrics.phase("sheet_sync"):
+            self._sync()
+
+    def _sync(self):
+        with self.busy:
+            try:
+                self.writer.flush()
+                refresh(self.get_sheet(), self.registry, self.store, self.writer.lock)
+            except Exception as e:
+                print(f"[ERROR] Sheet sync failed, will retry: {e}")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sync_once()
+            self.writer.wake.wait(self.interval)
+            self.writer.wake.clear()
+
+    def nudge(self):
+        self.writer.wake.set()
+
+    def stop(self):
+        """
+        Stop the thread and push whatever is still pending.
+        """
+        self._stop_event.set()
+        self.writer.wake.set()
+        if self.is_alive():
+            self.join()
+        self.writer.flush()
+
+
+def contiguous_runs(cells):
+    """
+    Group {column: value} into runs of adjacent columns.
+    """
+    run_start, run = None, []
+    for col in sorted(cells):
+        if run and col == run_start + len(run):
+            run.append(cells[col])
+            continue
+        if run:
+            yield run_start, run
+        run_start, run = col, [cells[col]]
+    if run:
+        yield run_start, run
+
+
+def _first_row_of_range(a1_range):
+    # e.g. "Sheet1!A101:J103" -> 101
+    cell = a1_range.split('!')[-1].split(':')[0]
+    digits = ''.join(ch for ch in cell if ch.isdigit())
+    return int(digits) if digits else None
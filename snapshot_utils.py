@@ -0,0 +1,99 @@
+import time
+from bot_config import SNAPSHOT_RECONCILE_HOURS, ROW_RETENTION_DAYS
+from state_utils import load_state, save_state
+from rate_utils import paced
+
+
+class BanSnapshots:
+    """
+    Local copy of every trusted sub's full ban list.
+
+    A sub's list is downloaded once, then kept current from the banuser and
+    unbanuser modlog entries the sync phase already reads and from the
+    bot's own ban actions. Every SNAPSHOT_RECONCILE_HOURS the full list is
+    downloaded again to correct any drift.
+
+    The newest ban/unban modlog action seen for each user is kept too, so
+    status questions can be answered without reading any modlog.
+    """
+
+    def __init__(self):
+        # sub -> {"built_at": epoch, "bans": {username: note}}
+        self.subs = load_state("ban_snapshots", {})
+        # username -> {"action", "sub", "mod", "created_utc"}
+        self.last_actions = load_state("modlog_last_actions", {})
+
+    def save(self):
+        save_state("ban_snapshots", self.subs)
+        cutoff = time.time() - ROW_RETENTION_DAYS * 86400
+        self.last_actions = {u: a for u, a in self.last_actions.items() if a["created_utc"] >= cutoff}
+        save_state("modlog_last_actions", self.last_actions)
+
+    def has(self, sub):
+        return sub.lower() in self.subs
+
+    def is_fresh(self, sub):
+        snap = self.subs.get(sub.lower())
+        return bool(snap) and time.time() - snap["built_at"] < SNAPSHOT_RECONCILE_HOURS * 3600
+
+    def bans(self, sr, sub, budget=None):
+        """
+        Return {username: note} for a sub, downloading the full ban list
+        first if we don't have one or it is due for reconciling. Pages are
+        paced by `budget` (a RateBudget) when one is given.
+        """
+        if not self.is_fresh(sub):
+            self.rebuild(sr, sub, budget)
+        return self.subs[sub.lower()]["bans"]
+
+    def rebuild(self, sr, sub, budget=None):
+        print(f"[INFO] Downloading full ban list for r/{sub}...")
+        built_at = time.time()
+        bans = {b.name.lower(): getattr(b, 'note', '') or '' for b in paced(sr.banned(limit=None), budget)}
+        self.subs[sub.lower()] = {"built_at": built_at, "bans": bans}
+        print(f"[INFO] r/{sub} has {len(bans)} bans.")
+
+    def is_banned(self, sub, user):
+        snap = self.subs.get(sub.lower())
+        return bool(snap) and user.lower() in snap["bans"]
+
+    def apply_modlog(self, sub, log):
+        """
+        Apply a banuser/unbanuser modlog entry to a sub's snapshot. Entries
+        older than the snapshot itself are already reflected in it.
+        """
+        snap = self.subs.get(sub.lower())
+        user = getattr(log, "target_author", None)
+        if not isinstance(user, str):
+            return
+        self.record_last_action(sub, user, log)
+        if not snap or log.created_utc < snap["built_at"]:
+            return
+        if log.action == "banuser":
+            snap["bans"][user.lower()] = (log.description or '').strip()
+        elif log.action == "unbanuser":
+            snap["bans"].pop(user.lower(), None)
+
+    def record_last_action(self, sub, user, log):
+        prev = self.last_actions.get(user.lower())
+        if prev and prev["created_utc"] >= log.created_utc:
+            return
+        self.last_actions[user.lower()] = {
+            "action": log.action,
+            "sub": sub.lower(),
+            "mod": getattr(log.mod, 'name', str(log.mod)),
+            "created_utc": log.created_utc,
+        }
+
+    def last_action(self, user):
+        return self.last_actions.get(user.lower())
+
+    def record_ban(self, sub, user, note):
+        snap = self.subs.get(sub.lower())
+        if snap:
+            snap["bans"][user.lower()] = note
+
+    def record_unban(self, sub, user):
+        snap = self.subs.get(sub.lower())
+        if snap:
+            snap["bans"].pop(user.lower(), None)
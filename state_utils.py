@@ -0,0 +1,39 @@
+import os
+import json
+from bot_config import STATE_DIR
+
+
+def _state_path(name):
+    return os.path.join(STATE_DIR, f"{name}.json")
+
+
+def load_state(name, default=None):
+    """
+    Load a named piece of bot state kept between runs.
+    Returns `default` if it was never saved or can't be read.
+    """
+    path = _state_path(name)
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[WARN] Could not read state file {path}: {e}. Starting fresh.")
+        return default
+
+
+def save_state(name, data):
+    """
+    Write a named piece of bot state. The file is replaced atomically so a
+    crash mid-write leaves the previous version intact.
+    """
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = _state_path(name)
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[ERROR] Failed to save state file {path}: {e}")
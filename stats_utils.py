@@ -1,63 +1,206 @@
-def write_stats_sheet(sheet_cache, client, sheet_key):
-    import gspread
-    from datetime import datetime, timedelta
-
-    try:
-        stats_sheet = client.open_by_key(sheet_key).worksheet("Stats")
-    except gspread.exceptions.WorksheetNotFound:
-        stats_sheet = client.open_by_key(sheet_key).add_worksheet(title="Stats", rows="100", cols="10")
+from datetime import datetime, timedelta
+from state_utils import load_state, save_state
+from registry_utils import parse_timestamp
 
-    today = datetime.utcnow().date()
-    week_ago = today - timedelta(days=7)
-    daily_counts = {}
-    weekly_counts = {}
-    user_counts = {}
 
-    for row in sheet_cache:
-        ts_str = row.get("Timestamp", "")
-        src = row.get("SourceSub", "unknown")
-        actor = row.get("OverriddenBy", "").strip()  # Use correct field
+class StatsAggregator:
+    """
+    Running ban statistics, kept between runs.
 
-        try:
-            ts = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-        except:
-            continue
+    Daily counts per source sub and per-moderator counts are updated from
+    only the ban store rows added or changed since the last update (followed
+    by the store's change counter). Each ban sheet row's contribution is
+    remembered so an edited row can be taken out again before its new
+    values are counted. Archived rows stay counted, but can't change any
+    more, so their contributions are forgotten.
+    """
 
-        date_key = ts.date().isoformat()
-        src = src.strip() or "unknown"
+    def __init__(self):
+        state = load_state("stats", None) or {}
+        self.generation = state.get("generation")
+        self.seq = state.get("seq", 0)
+        self.rows = state.get("rows", {})        # row uid (str) -> [date, src, actor]
+        self.archived_mark = state.get("archived_mark")  # newest archived_at seen
+        self.daily = state.get("daily", {})      # date -> {src: count}
+        self.mods = state.get("mods", {})        # actor -> count
+        self.written = state.get("written")      # grid last written to the Stats sheet
 
-        daily_counts.setdefault(date_key, {}).setdefault(src, 0)
-        daily_counts[date_key][src] += 1
+    def save(self):
+        save_state("stats", {
+            "generation": self.generation,
+            "seq": self.seq,
+            "rows": self.rows,
+            "archived_mark": self.archived_mark,
+            "daily": self.daily,
+            "mods": self.mods,
+            "written": self.written,
+        })
 
-        if ts.date() >= week_ago:
-            weekly_counts.setdefault(src, 0)
-            weekly_counts[src] += 1
+    def update(self, store):
+        """
+        Fold in rows changed since the last update. If the store was
+        replaced wholesale, start over from all of its rows, archived
+        ones included.
+        """
+        generation = store.generation
+        folded = 0
+        if generation != self.generation:
+            self.generation = generation
+            self.seq = -1
+            self.rows, self.daily, self.mods = {}, {}, {}
+            self.archived_mark = None
+            for _, row in store.archived_rows():
+                contribution = _contribution(row)
+                if contribution:
+                    self._count(contribution, 1)
+                folded += 1
+        changed, self.seq = store.changed_since(self.seq)
+        for uid, row in changed:
+            key = str(uid)
+            if key in self.rows:
+                self._count(self.rows.pop(key), -1)
+            contribution = _contribution(row)
+            if contribution:
+                self.rows[key] = contribution
+                self._count(contribution, 1)
+        archived, self.archived_mark = store.archived_since(self.archived_mark)
+        for uid in archived:
+            self.rows.pop(str(uid), None)
+        return folded + len(changed)
 
+    def _count(self, contribution, delta):
+        date_key, src, actor = contribution
+        day = self.daily.setdefault(date_key, {})
+        day[src] = day.get(src, 0) + delta
+        if not day[src]:
+            del day[src]
+            if not day:
+                del self.daily[date_key]
         if actor:
-            user_counts.setdefault(actor, 0)
-            user_counts[actor] += 1
+            self.mods[actor] = self.mods.get(actor, 0) + delta
+            if not self.mods[actor]:
+                del self.mods[actor]
+
+    def render(self, today=None):
+        """
+        Return the Stats worksheet content as a list of rows.
+
+        The three sections sit side by side (columns A-C, E-F and H-I), and
+        the daily counts run oldest first, so a new ban only changes the
+        rows of its own day at the bottom and the two short lists next to
+        them, not everything below it.
+        """
+        today = today or datetime.utcnow().date()
+        week_ago = (today - timedelta(days=7)).isoformat()
+        weekly_counts = {}
+        for day, counts in self.daily.items():
+            if day >= week_ago:
+                for src, count in counts.items():
+                    weekly_counts[src] = weekly_counts.get(src, 0) + count
+
+        # 📅 Daily Ban Count
+        daily = [["📅 Daily Ban Count"]]
+        for day in sorted(self.daily.keys()):
+            for sub, count in sorted(self.daily[day].items()):
+                daily.append([day, sub, count])
 
-    # Clear and start from the top
-    stats_sheet.clear()
+        # 📈 Weekly Bans Per Subreddit
+        weekly = [["📈 Weekly Bans Per Subreddit"]]
+        for sub, count in sorted(weekly_counts.items(), key=lambda x: (-x[1], x[0])):
+            weekly.append([sub, count])
+
+        # 🏆 Top Banning Moderators
+        mods = [["🏆 Top Banning Moderators"]]
+        for mod, count in sorted(self.mods.items(), key=lambda x: (-x[1], x[0])):
+            mods.append([mod, count])
+
+        return side_by_side((daily, 3), (weekly, 2), (mods, 2))
+
+
+def side_by_side(*sections):
+    """
+    Lay out (rows, width) sections next to each other, one blank column
+    apart, without trailing blanks.
+    """
     values = []
+    for r in range(max(len(rows) for rows, _ in sections)):
+        row = []
+        for rows, width in sections:
+            cells = list(rows[r]) if r < len(rows) else []
+            row += cells + [""] * (width - len(cells)) + [""]
+        while row and row[-1] == "":
+            row.pop()
+        values.append(row)
+    return values
+
+
+def _contribution(row):
+    ts = parse_timestamp(row.get("Timestamp", ""))
+    if ts is None:
+        return None
+    src = str(row.get("SourceSub", "unknown") or "").strip() or "unknown"
+    actor = str(row.get("OverriddenBy", "") or "").strip()  # Use correct field
+    return [datetime.utcfromtimestamp(ts).date().isoformat(), src, actor]
+
+
+def changed_cells(old, new):
+    """
+    Compare two grids and return {row: {col: value}} (1-based) for every
+    cell that differs. Cells only present in `old` are blanked.
+    """
+    changes = {}
+    for r in range(max(len(old), len(new))):
+        old_row = old[r] if r < len(old) else []
+        new_row = new[r] if r < len(new) else []
+        for c in range(max(len(old_row), len(new_row))):
+            before = old_row[c] if c < len(old_row) else ""
+            after = new_row[c] if c < len(new_row) else ""
+            if before != after:
+                changes.setdefault(r + 1, {})[c + 1] = after
+    return changes
+
+
+def write_stats_sheet(ctx):
+    import gspread
+    from gspread.utils import rowcol_to_a1
+    from sheet_utils import contiguous_runs, own_writes
+
+    stats = ctx.stats
+    changed = stats.update(ctx.store)
+    values = stats.render()
+    if values == stats.written:
+        print(f"[INFO] Stats unchanged ({changed} rows folded in), nothing to write.")
+        stats.save()
+        return
+
+    # The Stats worksheet lives in the ban spreadsheet: keep our writes
+    # from looking like a hand edit to the sheet sync.
+    with own_writes(ctx.sheet, ctx.store):
+        try:
+            stats_sheet = ctx.stats_sheet
+        except gspread.exceptions.WorksheetNotFound:
+            stats_sheet = ctx.sheet.spreadsheet.add_worksheet(title="Stats", rows="100", cols="10")
+            ctx.stats_sheet = stats_sheet
+            stats.written = None
+
+        if len(values) > stats_sheet.row_count:
+            stats_sheet.add_rows(len(values) - stats_sheet.row_count)
 
-    # 📅 Daily Ban Count
-    values.append(["📅 Daily Ban Count"])
-    for day in sorted(daily_counts.keys(), reverse=True):
-        for sub, count in daily_counts[day].items():
-            values.append([day, sub, count])
-
-    # 📈 Weekly Bans Per Subreddit
-    values.append([])
-    values.append(["📈 Weekly Bans Per Subreddit"])
-    for sub, count in sorted(weekly_counts.items(), key=lambda x: -x[1]):
-        values.append([sub, count])
-
-    # 🏆 Top Banning Moderators
-    values.append([])
-    values.append(["🏆 Top Banning Moderators"])
-    for mod, count in sorted(user_counts.items(), key=lambda x: -x[1]):
-        values.append([mod, count])
-
-    stats_sheet.update("A1", values)
-    print("[INFO] Stats written to 'Stats' worksheet.")
+        if stats.written is None:
+            # Nothing known about the sheet's content: clear and start from the top
+            stats_sheet.clear()
+            stats_sheet.update("A1", values)
+            print("[INFO] Stats written to 'Stats' worksheet.")
+        else:
+            data = []
+            for row, cells in changed_cells(stats.written, values).items():
+                for start, run in contiguous_runs(cells):
+                    end = start + len(run) - 1
+                    data.append({
+                        'range': f"{rowcol_to_a1(row, start)}:{rowcol_to_a1(row, end)}",
+                        'values': [run],
+                    })
+            stats_sheet.batch_update(data)
+            print(f"[INFO] Stats updated in 'Stats' worksheet ({len(data)} ranges changed).")
+    stats.written = values
+    stats.save()
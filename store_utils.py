@@ -0,0 +1,275 @@
+import os
+import json
+import sqlite3
+import threading
+from bot_config import STATE_DIR
+
+STORE_PATH = os.path.join(STATE_DIR, "bans.sqlite3")
+
+
+class BanStore:
+    """
+    Local SQLite copy of the ban sheet, and the bot's source of truth.
+
+    Each row keeps its sheet row number and the full row as JSON; lookups
+    by user, source or time are served by the in-memory BanRegistry. Rows
+    changed locally are flagged dirty (with the fields that changed) until
+    the sheet sync worker has written them to Google Sheets.
+
+    Every row also gets a uid that never changes, even when archiving
+    old rows renumbers the rest. Archived rows move to the archive table,
+    which stays indexed by username.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS bans (
+                row_num      INTEGER PRIMARY KEY,
+                data         TEXT NOT NULL,
+                dirty_fields TEXT,            -- JSON list, NULL when in sync
+                version      INTEGER NOT NULL DEFAULT 0,
+                seq          INTEGER NOT NULL DEFAULT 0, -- store-wide change counter
+                uid          INTEGER NOT NULL UNIQUE     -- stable across renumbering
+            );
+            CREATE INDEX IF NOT EXISTS bans_seq ON bans (seq);
+            CREATE TABLE IF NOT EXISTS archive (
+                uid          INTEGER PRIMARY KEY,
+                username_lc  TEXT NOT NULL,
+                data         TEXT NOT NULL,
+                archived_at  TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS archive_username ON archive (username_lc);
+            CREATE INDEX IF NOT EXISTS archive_archived_at ON archive (archived_at);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.db.commit()
+
+    # --- Meta ---
+
+    def _get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key, value):
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            return self._get_meta(key, default)
+
+    def set_meta(self, key, value):
+        with self.lock:
+            self._set_meta(key, value)
+            self.db.commit()
+
+    @property
+    def header(self):
+        with self.lock:
+            return self._get_meta("header", [])
+
+    @property
+    def sheet_rows(self):
+        """
+        Number of data rows known to exist in the sheet.
+        """
+        with self.lock:
+            return self._get_meta("sheet_rows", 0)
+
+    def set_sheet_rows(self, count):
+        self.set_meta("sheet_rows", count)
+
+    @property
+    def generation(self):
+        """
+        Bumped every time the whole store is replaced, so readers that
+        follow changes by sequence number know to start over.
+        """
+        with self.lock:
+            return self._get_meta("generation", 0)
+
+    def _next_seq(self):
+        seq = self._get_meta("seq", 0) + 1
+        self._set_meta("seq", seq)
+        return seq
+
+    def _next_uid(self):
+        uid = self._get_meta("uid", 0) + 1
+        self._set_meta("uid", uid)
+        return uid
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM bans").fetchone()[0]
+
+    # --- Rows ---
+
+    def load_rows(self):
+        with self.lock:
+            cur = self.db.execute("SELECT data FROM bans ORDER BY row_num")
+            return [json.loads(data) for (data,) in cur]
+
+    def replace_all(self, rows, header):
+        """
+        Replace the whole store with a fresh copy of the sheet.
+        """
+        with self.lock:
+            seq = self._next_seq()
+            first_uid = self._get_meta("uid", 0) + 1
+            self._set_meta("uid", first_uid + len(rows) - 1)
+            self.db.execute("DELETE FROM bans")
+            self.db.executemany(
+                "INSERT INTO bans (row_num, data, seq, uid) VALUES (?, ?, ?, ?)",
+                [(n, json.dumps(row), seq, first_uid + i)
+                 for i, (n, row) in enumerate(enumerate(rows, start=2))],
+            )
+            self._set_meta("generation", self._get_meta("generation", 0) + 1)
+            self._set_meta("header", list(header))
+            self._set_meta("sheet_rows", len(rows))
+            self.db.commit()
+
+    def put(self, row_num, row, dirty_fields=None):
+        """
+        Insert or replace a row. dirty_fields lists the fields the sheet
+        still has to be told about; they add up until the row is pushed.
+        Pass None for a row that already matches the sheet.
+        """
+        with self.lock:
+            dirty = None
+            if dirty_fields is not None:
+                prev = self.db.execute(
+                    "SELECT dirty_fields FROM bans WHERE row_num = ?", (row_num,)
+                ).fetchone()
+                merged = set(json.loads(prev[0])) if prev and prev[0] else set()
+                dirty = json.dumps(sorted(merged | set(dirty_fields)))
+            self.db.execute(
+                "INSERT INTO bans (row_num, data, dirty_fields, seq, uid) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (row_num) DO UPDATE SET data = excluded.data, "
+                "dirty_fields = excluded.dirty_fields, version = version + 1, seq = excluded.seq",
+                (row_num, json.dumps(row), dirty, self._next_seq(),
+                 self._next_uid()),
+            )
+            self.db.commit()
+
+    def dirty_rows(self):
+        """
+        Return [(row_num, row, dirty_fields, version)] for rows not yet in the sheet.
+        """
+        with self.lock:
+            cur = self.db.execute(
+                "SELECT row_num, data, dirty_fields, version FROM bans "
+                "WHERE dirty_fields IS NOT NULL ORDER BY row_num"
+            )
+            return [(n, json.loads(d), json.loads(f), v) for n, d, f, v in cur]
+
+    def mark_clean(self, pushed):
+        """
+        Clear the dirty flag of pushed rows, unless they changed again meanwhile.
+        `pushed` is a list of (row_num, version).
+        """
+        with self.lock:
+            self.db.executemany(
+                "UPDATE bans SET dirty_fields = NULL WHERE row_num = ? AND version = ?", pushed
+            )
+            self.db.commit()
+
+    def is_dirty(self, row_num):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT dirty_fields FROM bans WHERE row_num = ?", (row_num,)
+            ).fetchone()
+            return bool(row and row[0])
+
+    # --- Queries ---
+
+    def changed_since(self, seq):
+        """
+        Return ([(uid, row)], newest_seq) for rows added or changed
+        after change number `seq`.
+        """
+        with self.lock:
+            cur = self.db.execute(
+                "SELECT uid, data, seq FROM bans WHERE seq > ? ORDER BY seq", (seq,)
+            )
+            rows, newest = [], seq
+            for uid, d, row_seq in cur:
+                rows.append((uid, json.loads(d)))
+                newest = max(newest, row_seq)
+            return rows, newest
+
+    # --- Archive ---
+
+    def archive(self, row_nums, archived_at):
+        """
+        Move rows to the archive table and renumber the remaining rows to
+        match the sheet once those rows are deleted from it. Uids and
+        change numbers are kept, so nothing looks changed to readers.
+        """
+        gone = set(row_nums)
+        with self.lock:
+            moved = []
+            for n in sorted(gone):
+                found = self.db.execute("SELECT uid, data FROM bans WHERE row_num = ?", (n,)).fetchone()
+                if found:
+                    uid, data = found
+                    username = str(json.loads(data).get('Username', '') or '').strip().lower()
+                    moved.append((uid, username, data, archived_at))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO archive (uid, username_lc, data, archived_at) VALUES (?, ?, ?, ?)",
+                moved,
+            )
+            self.db.executemany("DELETE FROM bans WHERE row_num = ?", [(n,) for n in sorted(gone)])
+            # Ascending order: a row only ever moves up into a number that
+            # is already free.
+            remaining = [n for (n,) in self.db.execute("SELECT row_num FROM bans ORDER BY row_num")]
+            self.db.executemany(
+                "UPDATE bans SET row_num = ? WHERE row_num = ?",
+                [(new, old) for new, old in enumerate(remaining, start=2) if new != old],
+            )
+            self._set_meta("sheet_rows", max(self._get_meta("sheet_rows", 0) - len(gone), 0))
+            self.db.commit()
+
+    def archived_usernames(self):
+        with self.lock:
+            return {u for (u,) in self.db.execute("SELECT DISTINCT username_lc FROM archive")}
+
+    def archived_rows_for_user(self, username):
+        with self.lock:
+            cur = self.db.execute(
+                "SELECT data FROM archive WHERE username_lc = ? ORDER BY uid",
+                (username.strip().lower(),),
+            )
+            return [json.loads(d) for (d,) in cur]
+
+    def archived_rows(self):
+        """
+        Return [(uid, row)] for every archived row.
+        """
+        with self.lock:
+            cur = self.db.execute("SELECT uid, data FROM archive ORDER BY uid")
+            return [(uid, json.loads(d)) for uid, d in cur]
+
+    def archived_since(self, archived_at):
+        """
+        Return ([uid], newest archived_at) for rows archived after
+        `archived_at` (None for all of them).
+        """
+        with self.lock:
+            cur = self.db.execute(
+                "SELECT uid, archived_at FROM archive WHERE archived_at > ?", (archived_at or "",)
+            )
+            uids, newest = [], archived_at
+            for uid, at in cur:
+                uids.append(uid)
+                newest = at if newest is None else max(newest, at)
+            return uids, newest
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
@@ -1,10 +1,26 @@
 from datetime import datetime
-import time
+from concurrent.futures import ThreadPoolExecutor
 from log_utils import log_public_action
+from bot_config import CROSS_SUB_BAN_REASON, HELD_BAN_REASON, TRUSTED_SUBS, WORKER_COUNT
 
-def check_superuser_command():
-    from bot_config import reddit, CROSS_SUB_BAN_REASON, TRUSTED_SUBS
-    from cross_sub_ban_bot import SHEET_CACHE
+
+def fan_out(ctx, fn, subs):
+    """
+    Run fn(sub) for every sub on at most WORKER_COUNT threads.
+    Returns {sub: (ok, result or exception)} in `subs` order.
+    """
+    ctx.prepare_workers()
+    def call(sub):
+        try:
+            return True, fn(sub)
+        except Exception as e:
+            return False, e
+
+    with ThreadPoolExecutor(max_workers=max(1, WORKER_COUNT)) as pool:
+        return dict(zip(subs, pool.map(call, subs)))
+
+def check_superuser_command(ctx):
+    reddit = ctx.reddit
     try:
         inbox = reddit.inbox.unread(limit=None)
         for item in inbox:
@@ -19,7 +35,7 @@ def check_superuser_command():
             print(f"[SUPER] Received superuser command from u/{author}: {body}")
             tokens = body.split()
             if len(tokens) < 4:
-                print("[SUPER] Invalid format. Use: /xsub super <ban|unban|status> u/username [reason...]")
+                print("[SUPER] Invalid format. Use: /xsub super <ban|unban|release|status> u/username [reason...]")
                 item.mark_read()
                 continue
 
@@ -36,7 +52,7 @@ def check_superuser_command():
 
             # Status command is open to any mod
             if action == "status":
-                handle_status_command(username)
+                handle_status_command(ctx, username, live="--live" in tokens[4:])
                 item.mark_read()
                 continue
 
@@ -47,40 +63,87 @@ def check_superuser_command():
                 item.mark_read()
                 continue
 
-            for sub in TRUSTED_SUBS:
-                try:
-                    sr = reddit.subreddit(sub)
-                    if action == "ban":
-                        note = f"Superuser manual ban. Reason: {reason}"
-                        sr.banned.add(username, ban_reason=CROSS_SUB_BAN_REASON, note=note)
-                        print(f"[BANNED] u/{username} in r/{sub} by superuser")
-                        log_public_action("BANNED", username, sub, "manual", f"re-verse (supermodmail)", reason)
-                    elif action == "unban":
-                        sr.banned.remove(username)
-                        print(f"[UNBANNED] u/{username} in r/{sub} by superuser")
-                        log_public_action("UNBANNED", username, sub, "manual", f"re-verse (supermodmail)", reason)
-                    time.sleep(2)
-                except Exception as e:
-                    print(f"[ERROR] Failed to {action} u/{username} in r/{sub}: {e}")
-
-            item.reply(f"✅ Action complete: {action.upper()} u/{username} in all participating subs.")
+            if action == "release":
+                released = release_held_bans(ctx, username)
+                if released:
+                    item.reply(f"✅ Released {released} held ban(s) of u/{username}; "
+                               "they are enforced on the next pass if less than a day old.")
+                else:
+                    item.reply(f"ℹ️ No held bans found for u/{username}.")
+                item.mark_read()
+                continue
+
+            if action not in ("ban", "unban"):
+                print(f"[SUPER] Unknown action '{action}'")
+                item.reply(f"❌ Unknown action '{action}'. Use ban, unban, release or status.")
+                item.mark_read()
+                continue
+
+            results = fan_out(ctx, lambda sub: apply_super_action(ctx, action, username, sub, reason), TRUSTED_SUBS)
+            failed = {sub: err for sub, (ok, err) in results.items() if not ok}
+            for sub, err in failed.items():
+                print(f"[ERROR] Failed to {action} u/{username} in r/{sub}: {err}")
+
+            lines = [f"✅ Action complete: {action.upper()} u/{username} in "
+                     f"{len(results) - len(failed)} of {len(results)} participating subs."]
+            if failed:
+                lines.append("")
+                lines.append("❌ Failed in:")
+                lines.extend(f"- r/{sub}: {err}" for sub, err in failed.items())
+            item.reply("\n".join(lines))
             item.mark_read()
 
     except Exception as e:
         print(f"[ERROR] In superuser command handler: {e}")
 
-def handle_status_command(username):
-    from bot_config import reddit, TRUSTED_SUBS
-    from cross_sub_ban_bot import SHEET_CACHE
+def release_held_bans(ctx, username):
+    """
+    Turn a user's ban rows held by the daily limit back into normal pact
+    bans. Returns how many rows were released.
+    """
+    with ctx.writer.lock:
+        held = [n for n, r in ctx.registry.rows_for_user(username) if str(r.get('Reason')) == HELD_BAN_REASON]
+        for row_num in held:
+            ctx.writer.update_row(row_num, Reason=CROSS_SUB_BAN_REASON)
+    if held:
+        ctx.flush_writes()
+        print(f"[SUPER] Released {len(held)} held bans of u/{username}")
+    return len(held)
+
+def apply_super_action(ctx, action, username, sub, reason):
+    sr = ctx.reddit.subreddit(sub)
+    ctx.rate_budget.acquire()
+    if action == "ban":
+        note = f"Superuser manual ban. Reason: {reason}"
+        sr.banned.add(username, ban_reason=CROSS_SUB_BAN_REASON, note=note)
+        ctx.snapshots.record_ban(sub, username, f"{CROSS_SUB_BAN_REASON}: {note}")
+        print(f"[BANNED] u/{username} in r/{sub} by superuser")
+        log_public_action("BANNED", username, sub, "manual", "re-verse (supermodmail)", reason)
+    else:
+        sr.banned.remove(username)
+        ctx.snapshots.record_unban(sub, username)
+        print(f"[UNBANNED] u/{username} in r/{sub} by superuser")
+        log_public_action("UNBANNED", username, sub, "manual", "re-verse (supermodmail)", reason)
+
+
+def handle_status_command(ctx, username, live=False):
+    """
+    DM the owner a status report for a user.
+
+    By default it is answered from the registry and the local ban-list and
+    modlog snapshots, without any Reddit reads. With --live every sub's ban
+    list and recent modlog is checked in parallel (and the snapshots are
+    corrected from what was found).
+    """
+    reddit = ctx.reddit
     username_lc = username.lower()
-    subs_banned_in = []
-    last_action = None
 
     # Find sheet row
-    sheet_rows = [
-        row for row in SHEET_CACHE
-        if row.get("Username", "").strip().lower() == username_lc
-    ]
+    with ctx.writer.lock:
+        sheet_rows = [row for _, row in ctx.registry.rows_for_user(username_lc)]
+        archived = not sheet_rows and username_lc in ctx.registry.archived
+    if archived:
+        sheet_rows = ctx.store.archived_rows_for_user(username_lc)
     if sheet_rows:
         row = sheet_rows[0]
         source_sub = row.get("SourceSub", "❓")
@@ -91,33 +154,57 @@ def handle_status_command(username):
         forgiven = False
         exemptions = ""
 
-    # Live ban check
-    for sub in TRUSTED_SUBS:
-        try:
-            sr = reddit.subreddit(sub)
-            if username_lc in [b.name.lower() for b in sr.banned(limit=100)]:
-                subs_banned_in.append(sub)
-        except Exception:
-            continue
-
-    # Check last modlog entry
-    for sub in TRUSTED_SUBS:
-        try:
-            for log in reddit.subreddit(sub).mod.log(limit=50):
-                if getattr(log, "target_author", "").lower() == username_lc:
-                    last_action = f"{log.action} in r/{sub} by u/{log.mod} on {datetime.utcfromtimestamp(log.created_utc).strftime('%Y-%m-%d')}"
-                    break
-        except Exception:
-            continue
-        if last_action:
-            break
+    if live:
+        results = fan_out(ctx, lambda sub: live_status(ctx, username, sub), TRUSTED_SUBS)
+        subs_banned_in = [sub for sub, (ok, res) in results.items() if ok and res[0]]
+        unknown = [sub for sub, (ok, _) in results.items() if not ok]
+        actions = [res[1] for ok, res in results.values() if ok and res[1]]
+        last = max(actions, key=lambda a: a["created_utc"], default=None)
+    else:
+        subs_banned_in = [sub for sub in TRUSTED_SUBS if ctx.snapshots.is_banned(sub, username_lc)]
+        unknown = [sub for sub in TRUSTED_SUBS if not ctx.snapshots.has(sub)]
+        last = ctx.snapshots.last_action(username_lc)
+
+    last_action = None
+    if last:
+        day = datetime.utcfromtimestamp(last["created_utc"]).strftime('%Y-%m-%d')
+        last_action = f"{last['action']} in r/{last['sub']} by u/{last['mod']} on {day}"
 
     # Assemble message
-    lines = [f"Status report for u/{username}:"]
-    lines.append(f"🧾 Sheet Entry: {'Yes' if sheet_rows else 'No'} (origin: {source_sub})")
+    lines = [f"Status report for u/{username} ({'live' if live else 'from local snapshots'}):"]
+    entry = "Archived" if archived else ("Yes" if sheet_rows else "No")
+    lines.append(f"🧾 Sheet Entry: {entry} (origin: {source_sub})")
     lines.append(f"⛔ Currently Banned In: {', '.join(subs_banned_in) or 'None'}")
+    if unknown:
+        lines.append(f"❔ Unknown for: {', '.join(unknown)}")
     lines.append(f"✅ Forgiven: {'Yes' if forgiven else 'No'}")
     lines.append(f"✳️ Exempt in: {exemptions or 'None'}")
     lines.append(f"🗑️ Last ModLog Action: {last_action or 'None found'}")
 
     reddit.redditor("re-verse").message("User Status", "\n".join(lines))
+
+
+def live_status(ctx, username, sub):
+    """
+    Check one sub directly: returns (is_banned, newest modlog action on the
+    user among the last 50 entries, or None).
+    """
+    sr = ctx.reddit.subreddit(sub)
+    username_lc = username.lower()
+    ctx.rate_budget.acquire()
+    ban = next(iter(sr.banned(redditor=username)), None)
+    if ban is not None:
+        ctx.snapshots.record_ban(sub, username, getattr(ban, 'note', '') or '')
+    else:
+        ctx.snapshots.record_unban(sub, username)
+
+    ctx.rate_budget.acquire()
+    for log in sr.mod.log(limit=50):
+        if str(getattr(log, "target_author", "") or "").lower() == username_lc:
+            return ban is not None, {
+                "action": log.action,
+                "sub": sub,
+                "mod": getattr(log.mod, 'name', str(log.mod)),
+                "created_utc": log.created_utc,
+            }
+    return ban is not None, None
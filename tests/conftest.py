@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# bot_config reads BOT_WORK_DIR at import; keep test state out of the repo.
+os.environ.setdefault("BOT_WORK_DIR", tempfile.mkdtemp(prefix="banbot-tests-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def reddit_with():
+    """
+    Build a stand-in Reddit client whose prawcore rate limiter has seen
+    the given X-Ratelimit headers.
+    """
+    from prawcore.rate_limit import RateLimiter
+
+    def build(remaining, used, reset):
+        limiter = RateLimiter(window_size=600)
+        headers = {
+            "x-ratelimit-remaining": str(remaining),
+            "x-ratelimit-used": str(used),
+            "x-ratelimit-reset": str(reset),
+        }
+        try:
+            limiter.update(response_headers=headers)
+        except TypeError:  # prawcore < 3
+            limiter.update(headers)
+        return SimpleNamespace(_core=SimpleNamespace(_rate_limiter=limiter))
+    return build
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(tmp_path, monkeypatch):
+    """
+    Give every test its own .bot_state and an empty moderator cache.
+    """
+    import core_utils
+    import state_utils
+
+    monkeypatch.setattr(state_utils, "STATE_DIR", str(tmp_path / "state"))
+    core_utils.invalidate_mod_cache()
+
+
+@pytest.fixture
+def make_ctx():
+    """
+    Build a RunContext on benchmarks.fakes: a FakeReddit, a ban sheet
+    holding `rows` (dicts by column name) and an in-memory store.
+    """
+    from benchmarks.fakes import FakeReddit, FakeSpreadsheet
+    from registry_utils import SHEET_COLUMNS
+    from run_context import RunContext
+    from sheet_utils import full_load
+    from store_utils import BanStore
+
+    contexts = []
+
+    def build(rows=()):
+        sheet = FakeSpreadsheet().add_worksheet("Bans")
+        sheet.data = [list(SHEET_COLUMNS)] + [[row.get(c, "") for c in SHEET_COLUMNS] for row in rows]
+        ctx = RunContext()
+        ctx._reddit = FakeReddit()
+        ctx._sheets = (sheet, None, "test")
+        ctx._store = BanStore(":memory:")
+        full_load(sheet, ctx.registry, ctx.store)
+        contexts.append(ctx)
+        return ctx
+
+    yield build
+    for ctx in contexts:
+        ctx.close()
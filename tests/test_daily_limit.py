@@ -0,0 +1,65 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import core_utils
+from benchmarks.fakes import FakeLogEntry
+from bot_config import CROSS_SUB_BAN_REASON, HELD_BAN_REASON
+from core_utils import over_daily_limit
+from cross_sub_ban_bot import sync_bans_from_sub
+from registry_utils import TIMESTAMP_FORMAT
+from super import release_held_bans
+
+NOW = time.time()
+
+
+@pytest.fixture(autouse=True)
+def limit_of_three(monkeypatch):
+    monkeypatch.setattr(core_utils, "DAILY_BAN_LIMIT", 3)
+
+
+def row(user, source="r/habs", hours_ago=1):
+    when = datetime.utcfromtimestamp(NOW) - timedelta(hours=hours_ago)
+    return {"Username": user, "SourceSub": source, "Reason": CROSS_SUB_BAN_REASON,
+            "Timestamp": when.strftime(TIMESTAMP_FORMAT)}
+
+
+def ban_entry(user, n):
+    return FakeLogEntry(f"log{n}", "banuser", "habsmod", user, CROSS_SUB_BAN_REASON, NOW + n, "habs")
+
+
+def test_limit_counts_only_the_source_in_the_last_day(make_ctx):
+    ctx = make_ctx([row("a"), row("b"), row("c", source="r/leafs"), row("d", hours_ago=30)])
+    assert not over_daily_limit(ctx.registry, "r/habs", NOW)
+
+    ctx = make_ctx([row("a"), row("b"), row("c")])
+    assert over_daily_limit(ctx.registry, "r/habs", NOW)
+    assert not over_daily_limit(ctx.registry, "r/leafs", NOW)
+    # A day later the same rows no longer count.
+    assert not over_daily_limit(ctx.registry, "r/habs", NOW + 2 * 86400)
+
+
+def test_bans_past_the_limit_are_logged_but_held(make_ctx):
+    ctx = make_ctx([row("a"), row("b")])
+
+    sync_bans_from_sub(ctx, "habs", [ban_entry("third", 1), ban_entry("fourth", 2)])
+
+    reasons = {r.get("Username"): r.get("Reason") for r in ctx.registry}
+    assert reasons["third"] == CROSS_SUB_BAN_REASON
+    assert reasons["fourth"] == HELD_BAN_REASON
+    assert ctx.metrics.counters["held_bans"] == 1
+
+
+def test_released_hold_goes_back_to_a_pact_ban(make_ctx):
+    ctx = make_ctx([row("a"), row("b"), row("c")])
+    sync_bans_from_sub(ctx, "habs", [ban_entry("held", 1)])
+    assert ctx.registry.rows_for_user("held")[0][1].get("Reason") == HELD_BAN_REASON
+
+    assert release_held_bans(ctx, "held") == 1
+    ctx.writer.flush()
+
+    assert ctx.registry.rows_for_user("held")[0][1].get("Reason") == CROSS_SUB_BAN_REASON
+    sheet_row = ctx.sheet.data[-1]
+    assert sheet_row[0] == "held" and sheet_row[2] == CROSS_SUB_BAN_REASON
+    assert release_held_bans(ctx, "held") == 0
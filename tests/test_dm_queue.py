@@ -0,0 +1,47 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import cross_sub_ban_bot
+from dm_utils import DMQueue
+from metrics_utils import RunMetrics
+from rate_utils import RateBudget
+from registry_utils import BanRegistry
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(cross_sub_ban_bot, "send_ban_dm",
+                        lambda ctx, username, source_sub: sent.append(username))
+    return sent
+
+
+def context(reddit):
+    queue = DMQueue()
+    queue.notices = {}
+    queue.save = lambda: None
+    for user in ("alice", "bob"):
+        queue.add(user, "r/habs", 1700000000)
+    return SimpleNamespace(dm_queue=queue, registry=BanRegistry(), metrics=RunMetrics(),
+                           writer=SimpleNamespace(lock=threading.RLock()),
+                           rate_budget=RateBudget(reddit, reserve=10))
+
+
+def test_notices_wait_while_budget_is_exhausted(sent, reddit_with):
+    ctx = context(reddit_with(3, 597, 120))
+
+    cross_sub_ban_bot.send_queued_dms(ctx)
+
+    assert sent == []
+    assert [n["status"] for n in ctx.dm_queue.notices.values()] == ["pending", "pending"]
+
+
+def test_notices_go_out_with_budget_to_spare(sent, reddit_with):
+    ctx = context(reddit_with(500, 100, 300))
+
+    cross_sub_ban_bot.send_queued_dms(ctx)
+
+    assert sent == ["alice", "bob"]
+    assert [n["status"] for n in ctx.dm_queue.notices.values()] == ["sent", "sent"]
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from benchmarks.fakes import FakeBan, FakeRedditor
+from bot_config import CROSS_SUB_BAN_REASON, HELD_BAN_REASON
+from plan_utils import PlannedAction, api_calls_for, build_plan, desired_states
+from registry_utils import BanRegistry
+from snapshot_utils import BanSnapshots
+
+NOW = datetime(2026, 10, 17, 12, 0, 0)
+RECENT = "2026-10-17 11:00:00"
+OLD = "2026-10-14 11:00:00"
+SUBS = ["habs", "leafs", "caps"]
+
+
+def row(user, when=RECENT, **fields):
+    return {"Username": user, "SourceSub": "r/ottawasenators", "Reason": CROSS_SUB_BAN_REASON,
+            "Timestamp": when, **fields}
+
+
+def plan_for(rows, reddit):
+    return build_plan(BanRegistry(rows), BanSnapshots(), reddit, SUBS, now=NOW)
+
+
+def test_desired_states_cover_recent_rows_once_each():
+    registry = BanRegistry([
+        row("alice"),
+        row("alice"),
+        row("bob", ManualOverride="yes"),
+        row("carol", Reason=HELD_BAN_REASON),
+        row("dave", when=OLD),
+        row("erin", ExemptSubs="caps"),
+        row("hank", ForgiveTimestamp=RECENT),
+    ])
+
+    desired = desired_states(registry, NOW)
+
+    assert desired == [
+        ("alice", "r/ottawasenators", None, frozenset()),
+        ("bob", "r/ottawasenators", "Forgiven override", frozenset()),
+        ("erin", "r/ottawasenators", None, frozenset({"caps"})),
+    ]
+
+
+def test_released_hold_is_enforced_again():
+    registry = BanRegistry([row("carol", Reason=HELD_BAN_REASON)])
+    assert desired_states(registry, NOW) == []
+
+    registry.update(2, Reason=CROSS_SUB_BAN_REASON)
+    assert [d[0] for d in desired_states(registry, NOW)] == ["carol"]
+
+
+def test_plan_diffs_desired_state_against_ban_lists(make_ctx):
+    reddit = make_ctx().reddit
+    reddit.subreddit("leafs").banned.bans["bob"] = FakeBan("bob", CROSS_SUB_BAN_REASON)
+    reddit.subreddit("caps").banned.bans["erin"] = FakeBan("erin", CROSS_SUB_BAN_REASON)
+    reddit.subreddit("habs").banned.bans["gina"] = FakeBan("gina", CROSS_SUB_BAN_REASON)
+    reddit.subreddit("habs").mods = [FakeRedditor(reddit, "frank")]
+
+    plan = plan_for([
+        row("alice"),
+        row("bob", ManualOverride="yes"),
+        row("carol", Reason=HELD_BAN_REASON),
+        row("erin", ExemptSubs="caps"),
+        row("frank"),
+        row("gina"),
+    ], reddit)
+
+    src = "r/ottawasenators"
+    assert set(plan) == {
+        PlannedAction("ban", "alice", "habs", src, ""),
+        PlannedAction("ban", "alice", "leafs", src, ""),
+        PlannedAction("ban", "alice", "caps", src, ""),
+        PlannedAction("unban", "bob", "leafs", src, "Forgiven override"),
+        PlannedAction("ban", "erin", "habs", src, ""),
+        PlannedAction("ban", "erin", "leafs", src, ""),
+        PlannedAction("unban", "erin", "caps", src, "Per-sub exemption override"),
+        PlannedAction("ban", "frank", "leafs", src, ""),
+        PlannedAction("ban", "frank", "caps", src, ""),
+        PlannedAction("ban", "gina", "leafs", src, ""),
+        PlannedAction("ban", "gina", "caps", src, ""),
+    }
+    # Grouped by sub, in the order the subs were given.
+    assert [a.sub for a in plan] == sorted((a.sub for a in plan), key=SUBS.index)
+    # One call per action plus one notice per banned user and source.
+    assert api_calls_for(plan) == len(plan) + 4
+
+
+def test_unreadable_ban_list_leaves_sub_out_of_plan(make_ctx):
+    reddit = make_ctx().reddit
+
+    def broken(**kwargs):
+        raise RuntimeError("503")
+    reddit.subreddit("leafs").banned = broken
+
+    plan = plan_for([row("alice")], reddit)
+
+    assert {a.sub for a in plan} == {"habs", "caps"}
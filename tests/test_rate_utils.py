@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+import rate_utils
+from rate_utils import RateBudget
+
+
+class Waited(Exception):
+    pass
+
+
+def no_sleep(seconds):
+    raise Waited(seconds)
+
+
+def test_low_budget_has_no_spare_and_acquire_waits(monkeypatch, reddit_with):
+    monkeypatch.setattr(rate_utils.time, "sleep", no_sleep)
+    budget = RateBudget(reddit_with(3, 597, 120), reserve=10)
+
+    assert not budget.has_spare()
+    with pytest.raises(Waited):
+        budget.acquire()
+    assert budget.tokens == 3
+    assert budget.reset_at > time.time()
+
+
+def test_plenty_left_acquires_without_waiting(monkeypatch, reddit_with):
+    monkeypatch.setattr(rate_utils.time, "sleep", no_sleep)
+    budget = RateBudget(reddit_with(500, 100, 300), reserve=10)
+
+    assert budget.has_spare()
+    budget.acquire()
+    budget.acquire()
+    assert budget.tokens == 498
+
+
+def test_budget_refills_once_the_window_is_over(monkeypatch, reddit_with):
+    monkeypatch.setattr(rate_utils.time, "sleep", no_sleep)
+    budget = RateBudget(reddit_with(3, 597, 120), reserve=10)
+    assert not budget.has_spare()
+
+    later = budget.reset_at + 1
+    monkeypatch.setattr(rate_utils.time, "time", lambda: later)
+    budget.acquire()
+    assert budget.has_spare()
@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+
+from registry_utils import parse_timestamp
+
+
+def epoch(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_parse_timestamp_fixed_layout():
+    assert parse_timestamp("2026-10-17 04:06:22") == epoch(2026, 10, 17, 4, 6, 22)
+
+
+def test_parse_timestamp_without_zero_padding():
+    assert parse_timestamp("2026-10-17 4:06:22") == epoch(2026, 10, 17, 4, 6, 22)
+    assert parse_timestamp(" 2026-1-7 04:06:22 ") == epoch(2026, 1, 7, 4, 6, 22)
+
+
+def test_parse_timestamp_rejects_non_timestamps():
+    assert parse_timestamp("") is None
+    assert parse_timestamp("None") is None
+    assert parse_timestamp("2026-13-40 99:99:99") is None
@@ -0,0 +1,88 @@
+from bot_config import CROSS_SUB_BAN_REASON
+from sheet_utils import SheetWriteBuffer
+
+APPEND = "POST /values/{range}:append"
+BATCH_UPDATE = "POST /values:batchUpdate"
+
+
+def row(user, source="r/habs"):
+    return {"Username": user, "SourceSub": source, "Reason": CROSS_SUB_BAN_REASON,
+            "Timestamp": "2024-01-01 00:00:00"}
+
+
+def calls(ctx):
+    return ctx.sheet.spreadsheet.counter.snapshot()
+
+
+def cell(ctx, row_num, field):
+    values = ctx.sheet.data[row_num - 1]
+    col = ctx.registry.column(field) - 1
+    return values[col] if col < len(values) else ""
+
+
+def test_appends_go_out_in_one_call(make_ctx):
+    ctx = make_ctx([row("a")])
+    before = calls(ctx)
+
+    nums = [ctx.writer.append_row(**row(user)) for user in ("b", "c", "d")]
+    assert nums == [3, 4, 5]
+    # Registry and store see the rows before anything reaches the sheet.
+    assert ctx.registry.row(4).get("Username") == "c"
+    assert len(ctx.store.dirty_rows()) == 3
+    assert len(ctx.sheet.data) == 2
+
+    ctx.writer.flush()
+    delta = calls(ctx) - before
+    assert delta[APPEND] == 1
+    assert delta[BATCH_UPDATE] == 0
+    assert [r[0] for r in ctx.sheet.data[1:]] == ["a", "b", "c", "d"]
+    assert ctx.store.dirty_rows() == []
+    assert len(ctx.writer) == 0
+
+
+def test_updates_merge_into_one_batch(make_ctx):
+    ctx = make_ctx([row("a"), row("b"), row("c")])
+    before = calls(ctx)
+
+    ctx.writer.update_row(2, ManualOverride="TRUE")
+    ctx.writer.update_row(2, OverriddenBy="habsmod", ModSub="r/habs")
+    ctx.writer.update_row(4, ForgiveTimestamp="2024-02-01 00:00:00")
+    ctx.writer.flush()
+
+    delta = calls(ctx) - before
+    assert delta[BATCH_UPDATE] == 1
+    assert delta[APPEND] == 0
+    assert cell(ctx, 2, "ManualOverride") == "TRUE"
+    assert cell(ctx, 2, "OverriddenBy") == "habsmod"
+    assert cell(ctx, 2, "ModSub") == "r/habs"
+    assert cell(ctx, 4, "ForgiveTimestamp") == "2024-02-01 00:00:00"
+    # Untouched row stays as it was.
+    assert cell(ctx, 3, "ManualOverride") == ""
+    assert ctx.store.dirty_rows() == []
+
+
+def test_mixed_writes_take_one_call_each(make_ctx):
+    ctx = make_ctx([row("a")])
+    before = calls(ctx)
+
+    ctx.writer.update_row(2, ManualOverride="TRUE")
+    ctx.writer.append_row(**row("b"))
+    ctx.writer.flush()
+    ctx.writer.flush()   # nothing left to send
+
+    delta = calls(ctx) - before
+    assert delta[APPEND] == 1
+    assert delta[BATCH_UPDATE] == 1
+    assert cell(ctx, 2, "ManualOverride") == "TRUE"
+    assert ctx.sheet.data[2][0] == "b"
+
+
+def test_full_buffer_wakes_the_sync_worker(make_ctx):
+    ctx = make_ctx([row("a")])
+    writer = SheetWriteBuffer(lambda: ctx.sheet, ctx.registry, ctx.store, max_pending=2)
+
+    writer.update_row(2, ManualOverride="TRUE")
+    assert not writer.wake.is_set()
+    writer.append_row(**row("b"))
+    assert writer.wake.is_set()
+    assert len(writer) == 2
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+import pytest
+
+from stats_utils import StatsAggregator, changed_cells
+from store_utils import BanStore
+
+TODAY = date(2026, 10, 17)
+
+
+@pytest.fixture
+def store():
+    store = BanStore(":memory:")
+    yield store
+    store.close()
+
+
+def ban(day, sub, user):
+    return {"Username": user, "SourceSub": f"r/{sub}", "Timestamp": f"{day} 12:00:00"}
+
+
+def history(days, subs):
+    return [ban((TODAY - timedelta(days=d)).isoformat(), f"sub{s}", f"u{d}_{s}")
+            for d in range(days, 0, -1) for s in range(subs)]
+
+
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr("stats_utils.load_state", lambda name, default: default)
+    return StatsAggregator()
+
+
+def test_new_ban_only_rewrites_the_bottom_of_the_sheet(store, monkeypatch):
+    rows = history(200, 20)
+    store.replace_all(rows, ["Username", "SourceSub", "Timestamp"])
+    stats = fresh_stats(monkeypatch)
+    stats.update(store)
+    before = stats.render(TODAY)
+
+    store.put(len(rows) + 2, ban(TODAY.isoformat(), "sub7", "newcomer"))
+    assert stats.update(store) == 1
+    after = stats.render(TODAY)
+
+    assert len(after) == len(before) + 1
+    assert after[-1][:3] == [TODAY.isoformat(), "r/sub7", 1]
+    assert len(changed_cells(before, after)) <= 25
+
+
+def test_archived_rows_stay_counted_but_are_not_tracked(store, monkeypatch):
+    rows = history(30, 2)
+    store.replace_all(rows, ["Username", "SourceSub", "Timestamp"])
+    stats = fresh_stats(monkeypatch)
+    stats.update(store)
+    counted = stats.render(TODAY)
+
+    store.archive(range(2, 22), "2026-10-17 00:00:00")
+    stats.update(store)
+
+    assert len(stats.rows) == len(rows) - 20
+    assert stats.render(TODAY) == counted